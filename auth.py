@@ -1,17 +1,26 @@
+import hashlib
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from bson import ObjectId
 from dotenv import load_dotenv
 import os
 
+from database import get_db
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080"))
+MEMBER_CACHE_TTL_SECONDS = int(os.getenv("MEMBER_CACHE_TTL_SECONDS", "60"))
+MEMBER_CACHE_MAX_ENTRIES = 10000
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
 
 security = HTTPBearer()
 
@@ -50,16 +59,57 @@ def decode_token(token: str) -> dict:
         )
 
 
+# ─── Verified token cache ────────────────────────────────────────────────────
+# LRU of token digest -> (exp timestamp, claims). Clients poll with the same
+# token all day, so most requests can skip the HMAC verification. Entries are
+# only served before their exp claim; tokens without exp are never cached.
+
+_token_cache: OrderedDict = OrderedDict()
+_token_cache_stats = {"hits": 0, "misses": 0}
+
+
+def decode_token_cached(token: str) -> dict:
+    digest = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(digest)
+    if cached:
+        if cached[0] > time.time():
+            _token_cache.move_to_end(digest)
+            _token_cache_stats["hits"] += 1
+            return cached[1]
+        _token_cache.pop(digest, None)
+
+    _token_cache_stats["misses"] += 1
+    payload = decode_token(token)
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and TOKEN_CACHE_SIZE > 0:
+        _token_cache[digest] = (exp, payload)
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload
+
+
+def token_cache_metrics() -> dict:
+    hits, misses = _token_cache_stats["hits"], _token_cache_stats["misses"]
+    return {
+        "size": len(_token_cache),
+        "max_size": TOKEN_CACHE_SIZE,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+    }
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
-    payload = decode_token(token)
+    payload = decode_token_cached(token)
     user_id = payload.get("sub")
     role = payload.get("role")
     email = payload.get("email")
     owner_id = payload.get("owner_id")
+    member_id = payload.get("member_id")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    return {"user_id": user_id, "role": role, "email": email, "owner_id": owner_id}
+    return {"user_id": user_id, "role": role, "email": email, "owner_id": owner_id, "member_id": member_id}
 
 
 async def require_owner(current_user: dict = Depends(get_current_user)):
@@ -72,3 +122,55 @@ async def require_member(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "member":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Member access required")
     return current_user
+
+
+# ─── Member principal ────────────────────────────────────────────────────────
+# Maps a token's member_id claim (or email, for tokens issued before the claim
+# existed) to a small principal dict, so member endpoints don't have to look
+# up their own member document on every request.
+
+_member_cache: dict = {}
+
+
+def _member_cache_key(current_user: dict) -> str:
+    if current_user.get("member_id"):
+        return f"id:{current_user['member_id']}"
+    return f"email:{current_user['email']}"
+
+
+def forget_member(member_id: str):
+    """Drop cached principals for a member whose profile changed or was deleted."""
+    for key in [k for k, (_, principal) in _member_cache.items() if principal["member_id"] == member_id]:
+        _member_cache.pop(key, None)
+
+
+async def get_current_member(current_user: dict = Depends(get_current_user)) -> dict:
+    key = _member_cache_key(current_user)
+    cached = _member_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    db = get_db()
+    projection = {"name": 1, "email": 1}
+    if current_user.get("member_id"):
+        try:
+            member = await db.members.find_one({"_id": ObjectId(current_user["member_id"])}, projection)
+        except Exception:
+            member = None
+    else:
+        member = await db.members.find_one({"email": current_user["email"]}, projection)
+    if not member:
+        _member_cache.pop(key, None)
+        raise HTTPException(status_code=404, detail="Member profile not found")
+
+    principal = {
+        "member_id": str(member["_id"]),
+        "name": member.get("name", ""),
+        "email": member.get("email", ""),
+        "owner_id": current_user["owner_id"],
+    }
+    if len(_member_cache) >= MEMBER_CACHE_MAX_ENTRIES:
+        # Evict the oldest entry (dicts keep insertion order)
+        _member_cache.pop(next(iter(_member_cache)))
+    _member_cache[key] = (time.monotonic() + MEMBER_CACHE_TTL_SECONDS, principal)
+    return principal
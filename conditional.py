@@ -0,0 +1,143 @@
+"""
+Conditional GETs for hot read endpoints.
+
+Clients poll plans, settings, supplements, the member profile and the
+dashboard/reports many times for each change. Each of those responses gets a
+strong ETag derived from the owner's version counters in ``report_cache``,
+not from the response body. So a request carrying a matching
+``If-None-Match`` is answered ``304 Not Modified`` before the endpoint runs:
+no Mongo queries, no serialization.
+
+The tag covers the path and query string, the caller (token subject and
+role), the current day and the version of the data the endpoint reads:
+
+    /plans, /settings, /supplements, /members/me   that scope's counter
+    /dashboard/stats, /reports/*                   the owner-wide counter
+
+With the in-process cache backend every worker keeps its own counters, so
+the tag also includes the current REPORT_CACHE_TTL_SECONDS window. A change
+made through another worker is then seen within that window, which is the
+same bound the report cache itself has. The mongo backend shares its
+counters between workers and needs no window.
+"""
+
+import hashlib
+import time
+from datetime import date
+from urllib.parse import parse_qsl, urlencode
+
+from auth import decode_token_cached
+from report_cache import REPORT_CACHE_TTL_SECONDS, backend, owner_version
+
+# Exact paths -> the invalidation scope their responses depend on (None: everything the owner has)
+CONDITIONAL_PATHS = {
+    "/plans": "plans",
+    "/settings": "settings",
+    "/supplements": "supplements",
+    "/members/me": "members",
+    "/dashboard/stats": None,
+}
+CONDITIONAL_PREFIXES = {
+    "/reports/": None,
+}
+CACHE_CONTROL = "private, no-cache"
+
+_stats = {"not_modified": 0, "tagged": 0}
+
+
+def conditional_scope(path: str):
+    """``(True, scope)`` when ``path`` gets ETags, else ``(False, None)``."""
+    path = path.rstrip("/") or "/"
+    if path in CONDITIONAL_PATHS:
+        return True, CONDITIONAL_PATHS[path]
+    for prefix, scope in CONDITIONAL_PREFIXES.items():
+        if path.startswith(prefix):
+            return True, scope
+    return False, None
+
+
+def _bearer_claims(headers: dict):
+    authorization = headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        claims = decode_token_cached(token.strip())
+    except Exception:
+        return None
+    return claims if claims.get("sub") and claims.get("owner_id") else None
+
+
+def make_etag(path: str, query: str, claims: dict, version: str) -> str:
+    parts = [
+        path,
+        urlencode(sorted(parse_qsl(query, keep_blank_values=True))),
+        claims["sub"],
+        claims.get("role") or "",
+        date.today().isoformat(),  # "today", "this month" and expiry windows move at midnight
+        version,
+    ]
+    if backend.name == "memory":
+        parts.append(str(int(time.time() // max(REPORT_CACHE_TTL_SECONDS, 1))))
+    return '"' + hashlib.sha256("|".join(parts).encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+class ConditionalGetMiddleware:
+    """Tags 200 responses of the endpoints above and answers 304 when the client's copy is current."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        tagged, data_scope = conditional_scope(scope["path"])
+        if not tagged:
+            return await self.app(scope, receive, send)
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        claims = _bearer_claims(headers)
+        if not claims:
+            # Let the endpoint produce its usual 401/403
+            return await self.app(scope, receive, send)
+
+        try:
+            # Read the version before the endpoint runs: a write racing with it
+            # yields a tag that is already stale, never a fresh tag on old data
+            version = await owner_version(claims["owner_id"], data_scope)
+        except Exception as e:
+            print(f"⚠️  ETag version lookup failed: {e}")
+            return await self.app(scope, receive, send)
+        etag = make_etag(scope["path"], scope["query_string"].decode("latin-1"), claims, version)
+        extra_headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", CACHE_CONTROL.encode()),
+            (b"vary", b"Authorization"),
+        ]
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            _stats["not_modified"] += 1
+            await send({"type": "http.response.start", "status": 304, "headers": extra_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_tagged(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                _stats["tagged"] += 1
+                names = {name for name, _ in extra_headers}
+                message = {
+                    **message,
+                    "headers": [(k, v) for k, v in message.get("headers", []) if k.lower() not in names] + extra_headers,
+                }
+            await send(message)
+
+        await self.app(scope, receive, send_tagged)
+
+
+def conditional_metrics() -> dict:
+    return dict(_stats)
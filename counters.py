@@ -0,0 +1,210 @@
+"""
+Counter documents that are ``$inc``-maintained on write and rebuildable live.
+
+``daily_stats`` and ``member_stats`` are kept current by the write paths and
+recomputed from the raw collections by their rebuild jobs. A rebuild can run
+while the API serves writes without losing or double-counting any of them:
+
+- Every counted write names its *event ids*: the ObjectIds of the raw
+  documents it counts (a check-in, order or member), or the ``paid_id`` a
+  payment gets when it becomes paid. A live write bumps ``rev`` and, while a
+  rebuild of the collection is registered in ``counter_rebuilds``, also
+  appends the ids to the document's ``recent`` list.
+- A rebuild registers itself, waits until every worker has noticed (writers
+  re-check every REBUILD_CHECK_SECONDS), takes a watermark ObjectId and waits
+  SETTLE_SECONDS, so every event below the watermark is in the database.
+  Each document is then replaced by a recount of the raw events below the
+  watermark plus the ``recent`` events at or above it (live writes that have
+  already landed), and stamped ``rebuilt_through: <watermark>``.
+- A live write only applies while ``rebuilt_through`` is not above its event
+  id; events below the watermark are already in the recount.
+- The replacement only goes through if ``rev`` is unchanged since the
+  document was read; documents that changed in between are recounted.
+- When the rebuild finishes, the ``recent`` ids it tracked are dropped again.
+
+Readers project the bookkeeping fields away with ``COUNTER_PROJECTION``.
+
+This assumes a raw write is committed within SETTLE_SECONDS of its ObjectId
+being generated, and that worker clocks agree to within that much.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+SETTLE_SECONDS = 5
+REBUILD_RETRIES = 5
+# How long a worker trusts its last look at counter_rebuilds
+REBUILD_CHECK_SECONDS = 5
+# A registered rebuild is renewed this often; a crashed one lapses after REBUILD_LEASE_SECONDS
+REBUILD_RENEW_SECONDS = 60
+REBUILD_LEASE_SECONDS = 300
+# Upper bound on the event ids tracked per document during one rebuild
+RECENT_EVENTS = 1000
+
+# Bookkeeping fields readers never need
+COUNTER_PROJECTION = {"recent": 0, "rev": 0, "rebuilt_through": 0, "rebuild_id": 0}
+
+_rebuild_seen: dict = {}
+
+
+def same_second(event_ids: list) -> list:
+    """Split ``event_ids`` into groups that share an ObjectId timestamp.
+
+    Watermarks fall on whole seconds, so each group is entirely below or
+    entirely at/above any watermark and can be counted as one write.
+    """
+    groups: dict = {}
+    for event_id in event_ids:
+        groups.setdefault(event_id.generation_time, []).append(event_id)
+    return list(groups.values())
+
+
+async def rebuild_running(collection) -> bool:
+    """Whether a rebuild of ``collection`` is registered (cached for REBUILD_CHECK_SECONDS)."""
+    seen = _rebuild_seen.get(collection.name)
+    if seen and seen[0] > time.monotonic():
+        return seen[1]
+    try:
+        running = bool(await collection.database.counter_rebuilds.find_one(
+            {"collection": collection.name, "expires_at": {"$gt": datetime.utcnow()}}, {"_id": 1}
+        ))
+    except Exception as e:
+        print(f"⚠️  counter_rebuilds lookup failed: {e}")
+        running = True  # tracking ids when unsure only costs space
+    _rebuild_seen[collection.name] = (time.monotonic() + REBUILD_CHECK_SECONDS, running)
+    return running
+
+
+async def bump(collection, key: dict, update, event_ids: list):
+    """Apply a live counter ``update`` (operators or a pipeline) for ``event_ids`` from one second."""
+    query = {**key, "rebuilt_through": {"$not": {"$gt": min(event_ids)}}}
+    track = await rebuild_running(collection)
+    if isinstance(update, list):
+        bookkeeping = {"rev": {"$add": [{"$ifNull": ["$rev", 0]}, 1]}}
+        if track:
+            bookkeeping["recent"] = {
+                "$slice": [{"$concatArrays": [{"$ifNull": ["$recent", []]}, event_ids]}, -RECENT_EVENTS]
+            }
+        update = update + [{"$set": bookkeeping}]
+    else:
+        update = {**update, "$inc": {**update.get("$inc", {}), "rev": 1}}
+        if track:
+            update["$push"] = {"recent": {"$each": event_ids, "$slice": -RECENT_EVENTS}}
+    try:
+        await collection.update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        # Either a rebuild already counted the events (the query didn't match
+        # the existing document) or a concurrent upsert created it first;
+        # retrying without the upsert tells the two apart.
+        await collection.update_one(query, update)
+
+
+async def _renew(rebuilds, rebuild_id: ObjectId):
+    while True:
+        await asyncio.sleep(REBUILD_RENEW_SECONDS)
+        await rebuilds.update_one(
+            {"_id": rebuild_id},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=REBUILD_LEASE_SECONDS)}},
+        )
+
+
+@asynccontextmanager
+async def live_rebuild(collection):
+    """Register a rebuild of ``collection`` and yield its watermark once every event below it has settled."""
+    rebuilds = collection.database.counter_rebuilds
+    rebuild_id = (await rebuilds.insert_one({
+        "collection": collection.name,
+        "started_at": datetime.utcnow(),
+        "expires_at": datetime.utcnow() + timedelta(seconds=REBUILD_LEASE_SECONDS),
+    })).inserted_id
+    renew = asyncio.create_task(_renew(rebuilds, rebuild_id))
+    try:
+        print(f"   ⏳ Waiting {REBUILD_CHECK_SECONDS + SETTLE_SECONDS + 2}s for in-flight writes to settle...")
+        await asyncio.sleep(REBUILD_CHECK_SECONDS + 1)
+        watermark = ObjectId.from_datetime(datetime.utcnow())
+        await asyncio.sleep(SETTLE_SECONDS + 1)
+        yield watermark
+    finally:
+        renew.cancel()
+        await rebuilds.delete_one({"_id": rebuild_id})
+        others = await rebuilds.find_one(
+            {"collection": collection.name, "expires_at": {"$gt": datetime.utcnow()}}, {"_id": 1}
+        )
+        if not others:
+            # Ids tracked for this rebuild. A rebuild registering now takes its
+            # watermark over REBUILD_CHECK_SECONDS later and keeps only ids above it
+            cutoff = ObjectId.from_datetime(datetime.utcnow() + timedelta(seconds=1))
+            await collection.update_many({"recent": {"$lt": cutoff}}, {"$pull": {"recent": {"$lt": cutoff}}})
+            await collection.update_many({"recent": {"$size": 0}}, {"$unset": {"recent": ""}})
+
+
+def counted(watermark: ObjectId, applied: list, field: str = "_id") -> dict:
+    """Filter for the raw events a rebuild recounts: below ``watermark``, plus ``applied`` newer ones."""
+    return {"$or": [{field: {"$lt": watermark}}, {field: {"$in": applied}}]}
+
+
+async def rebuild_scope(collection, scope: dict, key_fields: tuple, compute, watermark: ObjectId,
+                        label: str) -> int:
+    """Replace every counter document in ``scope`` with a recount, retrying lost races.
+
+    ``compute(watermark, applied)`` returns ``{key tuple: counter fields}``
+    for ``scope``, counting raw events below ``watermark`` plus the
+    ``applied`` event ids. Documents in ``scope`` with nothing counted are
+    reset to their key. Returns the number of documents written.
+    """
+    projection = {**{field: 1 for field in key_fields}, "owner_id": 1, "rev": 1, "recent": 1}
+    only = None
+    written = 0
+    for _ in range(REBUILD_RETRIES):
+        current = {
+            tuple(doc[field] for field in key_fields): doc
+            async for doc in collection.find(scope, projection)
+        }
+        recent = {
+            key: [e for e in doc.get("recent", []) if e >= watermark] for key, doc in current.items()
+        }
+        computed = await compute(watermark, sorted({e for events in recent.values() for e in events}))
+        keys = (set(computed) | set(current)) if only is None else only
+
+        rebuild_id = ObjectId()
+        ops = []
+        for key in keys:
+            key_doc = dict(zip(key_fields, key))
+            doc = current.get(key)
+            replacement = {
+                **({"owner_id": doc["owner_id"]} if doc and "owner_id" in doc else {}),
+                **computed.get(key, {}),
+                **key_doc,
+                "rebuilt_through": watermark,
+                "rebuild_id": rebuild_id,
+                "rev": (doc or {}).get("rev") or 0,
+            }
+            if recent.get(key):
+                replacement["recent"] = recent[key]
+            if doc:
+                ops.append(ReplaceOne({**key_doc, "rev": doc.get("rev")}, replacement))
+            else:
+                ops.append(InsertOne(replacement))
+        if ops:
+            try:
+                await collection.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # A live write created the document first; it shows up as a conflict below
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+
+        replaced = {
+            tuple(doc[field] for field in key_fields)
+            async for doc in collection.find({**scope, "rebuild_id": rebuild_id}, projection)
+        }
+        written += len(replaced & keys)
+        only = keys - replaced
+        if not only:
+            return written
+    print(f"⚠️  {label}: {len(only)} document(s) kept changing during the rebuild; run it again")
+    return written
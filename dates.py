@@ -0,0 +1,114 @@
+"""
+BSON datetime companions for the ISO-string date fields.
+
+Documents keep their original string fields (``date``, ``joining_date``,
+``expiry_date``, ``check_in``), which the API returns unchanged, and also
+carry a real datetime next to each one so queries can use range scans:
+
+    date          -> date_at         (payments, attendance, orders)
+    joining_date  -> joining_at      (members)
+    expiry_date   -> expiry_at       (members)
+    check_in      -> check_in_at     (attendance; date + HH:MM)
+
+Calendar days are stored as midnight of that day. Until the
+``0001_bson_dates`` migration has backfilled existing documents, filters
+fall back to the string fields.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Union
+
+DATETIME_FIELDS = {
+    "date": "date_at",
+    "joining_date": "joining_at",
+    "expiry_date": "expiry_at",
+    "check_in": "check_in_at",
+}
+
+BSON_DATES_MIGRATION = "0001_bson_dates"
+
+# Flipped once the backfill migration is recorded as applied (see refresh_date_mode)
+_bson_dates_ready = False
+
+
+def day_start(value: Union[str, date]) -> datetime:
+    """Midnight of a calendar day given as a date or "YYYY-MM-DD"."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return datetime.combine(value, time.min)
+
+
+def at_time(day: Union[str, date], hhmm: str) -> Optional[datetime]:
+    """Datetime for a day plus an "HH:MM" time, or None if the time is unparseable."""
+    try:
+        hours, minutes = hhmm.split(":")[:2]
+        return day_start(day).replace(hour=int(hours), minute=int(minutes))
+    except (AttributeError, ValueError):
+        return None
+
+
+def date_fields(doc: dict) -> dict:
+    """The datetime companions for whichever string date fields ``doc`` carries."""
+    fields = {}
+    for source, target in DATETIME_FIELDS.items():
+        value = doc.get(source)
+        if not value:
+            continue
+        try:
+            if source == "check_in":
+                converted = at_time(doc["date"], value) if doc.get("date") else None
+            else:
+                converted = day_start(value)
+        except (TypeError, ValueError):
+            converted = None
+        if converted is not None:
+            fields[target] = converted
+    return fields
+
+
+def bson_dates_ready() -> bool:
+    return _bson_dates_ready
+
+
+async def refresh_date_mode(db):
+    """Re-read whether the datetime backfill has completed."""
+    global _bson_dates_ready
+    if not _bson_dates_ready:
+        done = await db.schema_migrations.find_one({"_id": BSON_DATES_MIGRATION, "applied_at": {"$ne": None}})
+        _bson_dates_ready = bool(done)
+
+
+def day_range(field: str, first: Optional[date] = None, last: Optional[date] = None) -> dict:
+    """Filter for ``field`` between two calendar days (inclusive, either end optional)."""
+    if bson_dates_ready():
+        bounds = {}
+        if first:
+            bounds["$gte"] = day_start(first)
+        if last:
+            bounds["$lt"] = day_start(last + timedelta(days=1))
+        return {DATETIME_FIELDS[field]: bounds}
+    bounds = {}
+    if first:
+        bounds["$gte"] = first.isoformat()
+    if last:
+        bounds["$lte"] = last.isoformat()
+    return {field: bounds}
+
+
+def sort_field(field: str) -> str:
+    """The field ``day_range`` filters on, so a sort on it can follow the same index."""
+    return DATETIME_FIELDS[field] if bson_dates_ready() else field
+
+
+def on_or_after_expr(field: str, day: date) -> dict:
+    """Aggregation expression that is true when ``field`` falls on or after a calendar day."""
+    if bson_dates_ready():
+        return {"$gte": [f"${DATETIME_FIELDS[field]}", day_start(day)]}
+    return {"$gte": [f"${field}", day.isoformat()]}
+
+
+def before_day(field: str, day: date) -> dict:
+    """Filter for ``field`` strictly before a calendar day."""
+    if bson_dates_ready():
+        return {DATETIME_FIELDS[field]: {"$lt": day_start(day)}}
+    return {field: {"$lt": day.isoformat()}}
@@ -0,0 +1,53 @@
+"""
+Sparse fieldsets for list endpoints.
+
+``?fields=name,email,status`` trims every row to those fields (``id`` is
+always included) and becomes the Mongo projection, so unrequested fields
+never leave the database. ``fields=all`` returns every field. Endpoints pair
+this with a list model whose fields are all optional and
+``response_model_exclude_unset=True``, so omitted fields are absent from the
+JSON rather than null.
+"""
+
+from typing import Optional
+from fastapi import HTTPException, Query
+
+
+class FieldSet:
+    """Dependency that resolves ``?fields=`` against the fields an endpoint offers."""
+
+    def __init__(self, available: list, default: Optional[list] = None):
+        self.available = list(available)
+        self.default = list(default or available)
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'all'"),
+    ) -> list:
+        if not fields:
+            return self.default
+        if fields.strip() == "all":
+            return self.available
+        requested = []
+        for name in fields.split(","):
+            name = name.strip()
+            if name and name not in requested:
+                requested.append(name)
+        unknown = [name for name in requested if name not in self.available]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+        return ["id"] + [name for name in requested if name != "id"]
+
+
+def projection(fields: list, *extra: str) -> dict:
+    """Mongo projection for ``fields`` plus any fields the query itself needs (e.g. the sort key)."""
+    return {name: 1 for name in (*fields, *extra) if name != "id"}
+
+
+def pick(doc: dict, fields: list, defaults: Optional[dict] = None) -> dict:
+    """The requested ``fields`` of a raw document, ``_id`` rendered as ``id``."""
+    defaults = defaults or {}
+    row = {}
+    for name in fields:
+        row[name] = str(doc["_id"]) if name == "id" else doc.get(name, defaults.get(name))
+    return row
@@ -0,0 +1,122 @@
+"""
+Async password hashing.
+
+bcrypt is deliberately slow (~200ms per call), so running it inside an async
+handler freezes the event loop for every other request on the worker. The
+helpers here run ``auth.get_password_hash`` / ``auth.verify_password`` on a
+dedicated, size-limited thread pool (bcrypt releases the GIL while hashing)
+and keep queue-depth metrics for ``/health/metrics``.
+
+Bulk member imports hash thousands of passwords at once; ``hash_passwords``
+spreads those over IMPORT_HASH_PROCESSES worker processes instead, so an
+import never competes with logins for the thread pool.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+
+from auth import get_password_hash, verify_password
+
+load_dotenv()
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Requests beyond this many waiting hashes are rejected with 503 instead of piling up
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "200"))
+IMPORT_HASH_PROCESSES = int(os.getenv("IMPORT_HASH_PROCESSES", str(os.cpu_count() or 1)))
+
+_executor: ThreadPoolExecutor = None
+_process_pool: ProcessPoolExecutor = None
+
+# Counters are touched from both the event loop and the pool threads
+_stats_lock = threading.Lock()
+_stats = {
+    "queued": 0,
+    "running": 0,
+    "completed": 0,
+    "rejected": 0,
+    "peak_queue_depth": 0,
+    "total_wait_ms": 0.0,
+}
+
+
+def _timed(fn, enqueued_at: float, *args):
+    with _stats_lock:
+        _stats["queued"] -= 1
+        _stats["running"] += 1
+        _stats["total_wait_ms"] += (time.perf_counter() - enqueued_at) * 1000
+    try:
+        return fn(*args)
+    finally:
+        with _stats_lock:
+            _stats["running"] -= 1
+            _stats["completed"] += 1
+
+
+async def _run(fn, *args):
+    with _stats_lock:
+        if _stats["queued"] >= HASH_QUEUE_LIMIT:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        _stats["queued"] += 1
+        _stats["peak_queue_depth"] = max(_stats["peak_queue_depth"], _stats["queued"])
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _timed, fn, time.perf_counter(), *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+async def hash_passwords(passwords: list) -> list:
+    """Hash a batch of passwords in parallel worker processes (bulk imports)."""
+    global _process_pool
+    if _process_pool is None:
+        # spawn: forking a process that already runs the event loop and thread pools isn't safe
+        _process_pool = ProcessPoolExecutor(
+            max_workers=IMPORT_HASH_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(_process_pool, get_password_hash, p) for p in passwords))
+
+
+def hashing_metrics() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    completed = stats["completed"]
+    return {
+        "workers": HASH_WORKERS,
+        "queue_limit": HASH_QUEUE_LIMIT,
+        "queue_depth": stats["queued"],
+        "running": stats["running"],
+        "completed": completed,
+        "rejected": stats["rejected"],
+        "peak_queue_depth": stats["peak_queue_depth"],
+        "avg_wait_ms": round(stats["total_wait_ms"] / completed, 2) if completed else 0.0,
+    }
+
+
+def shutdown_hasher():
+    global _executor, _process_pool
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
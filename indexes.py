@@ -0,0 +1,171 @@
+"""
+GymPro Index Manifest
+=====================
+Declares every MongoDB index the API relies on. The FastAPI lifespan applies
+the manifest on startup (creating an index that already exists is a no-op),
+and this module can be run directly to compare the manifest with the live
+database.
+
+Usage:
+    python indexes.py            # report drift between manifest and database
+    python indexes.py --apply    # create any missing indexes
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "gympro")
+
+
+# collection -> list of (name, keys, options)
+INDEX_MANIFEST = {
+    "users": [
+        ("email_unique", [("email", ASCENDING)], {"unique": True}),
+        ("reset_token", [("reset_token", ASCENDING)], {"sparse": True}),
+    ],
+    "members": [
+        ("email_unique", [("email", ASCENDING)], {"unique": True}),
+        ("owner_name", [("owner_id", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], {}),
+        ("owner_status", [("owner_id", ASCENDING), ("status", ASCENDING)], {}),
+        ("owner_expiry", [("owner_id", ASCENDING), ("expiry_date", ASCENDING)], {}),
+        ("owner_plan", [("owner_id", ASCENDING), ("plan_id", ASCENDING)], {}),
+        ("status_expiry_at", [("status", ASCENDING), ("expiry_at", ASCENDING)], {}),
+        ("owner_search", [("owner_id", ASCENDING), ("search_tokens", ASCENDING)], {}),
+    ],
+    "plans": [
+        ("owner_price", [("owner_id", ASCENDING), ("price", ASCENDING)], {}),
+    ],
+    "payments": [
+        ("owner_status_date", [("owner_id", ASCENDING), ("status", ASCENDING), ("date", DESCENDING)], {}),
+        ("owner_date", [("owner_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], {}),
+        ("member_date", [("member_id", ASCENDING), ("date", DESCENDING)], {}),
+        ("owner_status_date_at", [("owner_id", ASCENDING), ("status", ASCENDING), ("date_at", DESCENDING)], {}),
+        ("owner_date_at", [("owner_id", ASCENDING), ("date_at", DESCENDING)], {}),
+    ],
+    "attendance": [
+        (
+            "owner_member_date_unique",
+            [("owner_id", ASCENDING), ("member_id", ASCENDING), ("date", ASCENDING)],
+            {"unique": True},
+        ),
+        ("owner_date", [("owner_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], {}),
+        ("member_date", [("member_id", ASCENDING), ("date", DESCENDING)], {}),
+        ("owner_date_at", [("owner_id", ASCENDING), ("date_at", DESCENDING)], {}),
+        ("member_date_at", [("member_id", ASCENDING), ("date_at", DESCENDING)], {}),
+    ],
+    "supplements": [
+        ("owner_name", [("owner_id", ASCENDING), ("name", ASCENDING)], {}),
+        ("owner_search", [("owner_id", ASCENDING), ("search_tokens", ASCENDING)], {}),
+    ],
+    "orders": [
+        ("owner_date", [("owner_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], {}),
+        ("member_date", [("member_id", ASCENDING), ("date", DESCENDING)], {}),
+        ("owner_date_at", [("owner_id", ASCENDING), ("date_at", DESCENDING)], {}),
+    ],
+    "daily_stats": [
+        ("owner_date_unique", [("owner_id", ASCENDING), ("date", ASCENDING)], {"unique": True}),
+    ],
+    "member_stats": [
+        ("owner_last_visit", [("owner_id", ASCENDING), ("last_visit", ASCENDING)], {}),
+    ],
+    "report_cache": [
+        ("expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "counter_rebuilds": [
+        ("expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "member_imports": [
+        ("owner_created", [("owner_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "gym_settings": [
+        ("owner_id", [("owner_id", ASCENDING)], {}),
+    ],
+}
+
+# Options that change index behaviour and therefore count as drift
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+async def ensure_indexes(db):
+    """Create every declared index. Safe to call on every startup."""
+    created = 0
+    for collection, specs in INDEX_MANIFEST.items():
+        models = [IndexModel(keys, name=name, **options) for name, keys, options in specs]
+        try:
+            await db[collection].create_indexes(models)
+            created += len(models)
+        except OperationFailure as e:
+            # Conflicting definitions or duplicate data must not stop the API from booting
+            print(f"⚠️  Could not apply indexes on '{collection}': {e}")
+    print(f"✅ Index manifest applied ({created} indexes checked)")
+
+
+async def index_drift(db) -> dict:
+    """Compare the manifest with the live database.
+
+    Returns ``{collection: {"missing": [...], "changed": [...], "extra": [...]}}``
+    for every collection that differs from the manifest.
+    """
+    drift = {}
+    for collection, specs in INDEX_MANIFEST.items():
+        actual = await db[collection].index_information()
+        actual.pop("_id_", None)
+        missing, changed = [], []
+        for name, keys, options in specs:
+            info = actual.pop(name, None)
+            if info is None:
+                missing.append(name)
+                continue
+            declared = {opt: options.get(opt) for opt in COMPARED_OPTIONS}
+            existing = {opt: info.get(opt) for opt in COMPARED_OPTIONS}
+            if [tuple(k) for k in info["key"]] != list(keys) or declared != existing:
+                changed.append(name)
+        extra = sorted(actual.keys())
+        if missing or changed or extra:
+            drift[collection] = {"missing": missing, "changed": changed, "extra": extra}
+    return drift
+
+
+async def main(apply: bool) -> int:
+    if not MONGODB_URL:
+        print("❌  Please set MONGODB_URL in your .env file first!")
+        return 2
+
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client[DATABASE_NAME]
+    try:
+        if apply:
+            await ensure_indexes(db)
+        drift = await index_drift(db)
+    finally:
+        client.close()
+
+    if not drift:
+        print("✅ Database indexes match the manifest")
+        return 0
+
+    for collection, report in drift.items():
+        print(f"📂 {collection}")
+        for name in report["missing"]:
+            print(f"   ➕ missing:  {name}")
+        for name in report["changed"]:
+            print(f"   ✏️  changed:  {name}")
+        for name in report["extra"]:
+            print(f"   ➖ extra:    {name}")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check or apply the GymPro index manifest")
+    parser.add_argument("--apply", action="store_true", help="create missing indexes before checking")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.apply)))
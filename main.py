@@ -4,11 +4,22 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 
-from database import connect_db, close_db
+from database import connect_db, close_db, get_db
+from indexes import ensure_indexes
+from migrations import pending_migrations
+from dates import refresh_date_mode
+from search import refresh_search_mode
+from scheduler import start_scheduler, stop_scheduler
+from pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from hashing import hashing_metrics, shutdown_hasher
+from auth import token_cache_metrics
+from report_cache import report_cache_metrics
+from conditional import ConditionalGetMiddleware, conditional_metrics
 
 # Import all routers
 from routes.auth import router as auth_router
 from routes.members import router as members_router
+from routes.member_import import router as member_import_router, fail_stale_imports
 from routes.plans import router as plans_router
 from routes.payments import router as payments_router
 from routes.attendance import router as attendance_router
@@ -18,6 +29,8 @@ from routes.dashboard import router as dashboard_router
 from routes.settings import router as settings_router
 from routes.reminders import router as reminders_router
 from routes.razorpay_payments import router as razorpay_router
+from routes.exports import router as exports_router
+from routes.media import router as media_router
 
 load_dotenv()
 
@@ -25,7 +38,17 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_db()
+    await ensure_indexes(get_db())
+    await refresh_date_mode(get_db())
+    await refresh_search_mode(get_db())
+    await fail_stale_imports(get_db())
+    pending = await pending_migrations(get_db())
+    if pending:
+        print(f"⚠️  {len(pending)} pending migration(s): {', '.join(m.ID for m in pending)} — run `python -m migrations --apply`")
+    start_scheduler()
     yield
+    await stop_scheduler()
+    shutdown_hasher()
     await close_db()
 
 
@@ -36,6 +59,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# ETag / 304 for polled reads; added before CORS so CORS wraps it and 304s keep their CORS headers
+app.add_middleware(ConditionalGetMiddleware)
+
 # CORS — allow the Vite dev server
 allowed_origins_str = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:8080")
 allowed_origins = [origin.strip() for origin in allowed_origins_str.split(",") if origin.strip()]
@@ -46,11 +72,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, "ETag"],
 )
 
 # Mount all routers
 app.include_router(auth_router)
 app.include_router(members_router)
+app.include_router(member_import_router)
 app.include_router(plans_router)
 app.include_router(payments_router)
 app.include_router(attendance_router)
@@ -60,6 +88,8 @@ app.include_router(dashboard_router)
 app.include_router(settings_router)
 app.include_router(reminders_router)
 app.include_router(razorpay_router)
+app.include_router(exports_router)
+app.include_router(media_router)
 
 
 @app.get("/", tags=["Health"])
@@ -74,3 +104,13 @@ async def root():
 @app.get("/health", tags=["Health"])
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/health/metrics", tags=["Health"])
+async def health_metrics():
+    return {
+        "password_hashing": hashing_metrics(),
+        "token_cache": token_cache_metrics(),
+        "report_cache": report_cache_metrics(),
+        "conditional_get": conditional_metrics(),
+    }
@@ -0,0 +1,226 @@
+"""
+Content-addressed media store for avatars and supplement images.
+
+Every blob is stored once under the sha256 of its bytes, so identical uploads
+share storage and a blob's URL can be cached forever. Documents keep only a
+short reference (``/media/<sha256>``) instead of an inline data URL. The
+``media`` collection holds per-blob metadata:
+
+    {_id: <sha256>, content_type, size, width, height, thumb: <sha256 or None>, created_at}
+
+MEDIA_BACKEND selects where the bytes live:
+
+    gridfs  (default) the ``media_blobs`` GridFS bucket in the app database
+    disk    files under MEDIA_DIR, sharded by the first hash characters
+
+Thumbnails (THUMB_SIZE px, WebP) are generated on upload when Pillow is
+installed; without it the original is served in their place.
+
+References are stored relative. Responses turn them into absolute URLs with
+``public_url`` when MEDIA_PUBLIC_URL (the origin the API is reachable at) is
+set; otherwise clients resolve them against the API base URL themselves.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from dotenv import load_dotenv
+
+from database import get_db
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # thumbnails are optional
+    Image = None
+
+load_dotenv()
+
+MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "gridfs")
+MEDIA_DIR = os.getenv("MEDIA_DIR", "media")
+MEDIA_MAX_MB = int(os.getenv("MEDIA_MAX_MB", "5"))
+THUMB_SIZE = 256
+MEDIA_URL_PREFIX = "/media/"
+MEDIA_PUBLIC_URL = os.getenv("MEDIA_PUBLIC_URL", "").rstrip("/")
+STREAM_CHUNK_BYTES = 256 * 1024
+
+# Magic-number prefixes of the image types we accept
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URL = re.compile(r"^data:([\w/+.-]+)?(;base64)?,", re.IGNORECASE)
+
+
+def sniff_content_type(data: bytes) -> Optional[str]:
+    for signature, content_type in SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def is_media_id(value: str) -> bool:
+    return bool(_SHA256.match(value or ""))
+
+
+def media_url(media_id: str) -> str:
+    return f"{MEDIA_URL_PREFIX}{media_id}"
+
+
+def public_url(value: Optional[str]) -> Optional[str]:
+    """A stored media reference as clients should fetch it; other values pass through."""
+    if value and MEDIA_PUBLIC_URL and value.startswith(MEDIA_URL_PREFIX):
+        return MEDIA_PUBLIC_URL + value
+    return value
+
+
+# ─── Blob backends ────────────────────────────────────────────────────────────
+
+class GridFSStore:
+    name = "gridfs"
+
+    def _bucket(self):
+        return AsyncIOMotorGridFSBucket(get_db(), bucket_name="media_blobs")
+
+    async def put(self, media_id: str, data: bytes, content_type: str):
+        bucket = self._bucket()
+        try:
+            await bucket.upload_from_stream_with_id(
+                media_id, media_id, data, metadata={"content_type": content_type}
+            )
+        except Exception:
+            # Two uploads of the same bytes can race; the first one wins
+            if not await get_db()["media_blobs.files"].find_one({"_id": media_id}, {"_id": 1}):
+                raise
+
+    async def stream(self, media_id: str):
+        grid_out = await self._bucket().open_download_stream(media_id)
+        while chunk := await grid_out.read(STREAM_CHUNK_BYTES):
+            yield chunk
+
+
+class DiskStore:
+    name = "disk"
+
+    def _path(self, media_id: str) -> str:
+        return os.path.join(MEDIA_DIR, media_id[:2], media_id[2:4], media_id)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    async def put(self, media_id: str, data: bytes, content_type: str):
+        await asyncio.to_thread(self._write, self._path(media_id), data)
+
+    async def stream(self, media_id: str):
+        with open(self._path(media_id), "rb") as f:
+            while chunk := await asyncio.to_thread(f.read, STREAM_CHUNK_BYTES):
+                yield chunk
+
+
+STORES = {"gridfs": GridFSStore, "disk": DiskStore}
+
+store = STORES.get(MEDIA_BACKEND, GridFSStore)()
+
+
+# ─── Saving ───────────────────────────────────────────────────────────────────
+
+def make_thumbnail(data: bytes):
+    """``(thumbnail_bytes_or_None, (width, height) or None)`` for an image."""
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            size = image.size
+            image = ImageOps.exif_transpose(image)
+            if max(image.size) <= THUMB_SIZE:
+                return None, size
+            image.thumbnail((THUMB_SIZE, THUMB_SIZE))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            out = io.BytesIO()
+            image.save(out, format="WEBP", quality=80)
+            return out.getvalue(), size
+    except Exception as e:
+        print(f"⚠️  Thumbnail generation failed: {e}")
+        return None, None
+
+
+async def _put_blob(data: bytes, content_type: str, **meta) -> str:
+    media_id = hashlib.sha256(data).hexdigest()
+    db = get_db()
+    if await db.media.find_one({"_id": media_id}, {"_id": 1}):
+        return media_id
+    await store.put(media_id, data, content_type)
+    await db.media.update_one(
+        {"_id": media_id},
+        {"$setOnInsert": {
+            "content_type": content_type,
+            "size": len(data),
+            "created_at": datetime.utcnow(),
+            **meta,
+        }},
+        upsert=True,
+    )
+    return media_id
+
+
+async def save_image(data: bytes) -> dict:
+    """Store an uploaded image (and its thumbnail); returns its metadata document."""
+    if len(data) > MEDIA_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Images are limited to {MEDIA_MAX_MB} MB")
+    content_type = sniff_content_type(data)
+    if not content_type:
+        raise HTTPException(status_code=400, detail="Only PNG, JPEG, GIF and WebP images are supported")
+
+    media_id = hashlib.sha256(data).hexdigest()
+    existing = await get_db().media.find_one({"_id": media_id})
+    if existing:
+        return existing
+
+    thumb, size = await asyncio.to_thread(make_thumbnail, data)
+    thumb_id = await _put_blob(thumb, "image/webp", thumb=None) if thumb else None
+    width, height = size or (None, None)
+    await _put_blob(data, content_type, width=width, height=height, thumb=thumb_id)
+    return await get_db().media.find_one({"_id": media_id})
+
+
+def decode_data_url(value: str) -> bytes:
+    match = _DATA_URL.match(value)
+    if not match or not match.group(2):
+        raise ValueError("Only base64 data URLs are supported")
+    try:
+        return base64.b64decode(value[match.end():], validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid base64 image data")
+
+
+async def externalize(value: Optional[str]) -> Optional[str]:
+    """Replace an inline ``data:`` image with a media reference; other values pass through."""
+    if value and MEDIA_PUBLIC_URL and value.startswith(MEDIA_PUBLIC_URL + MEDIA_URL_PREFIX):
+        return value[len(MEDIA_PUBLIC_URL):]  # a URL we handed out, sent back
+    if not value or not _DATA_URL.match(value):
+        return value
+    try:
+        data = decode_data_url(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return media_url((await save_image(data))["_id"])
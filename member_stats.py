@@ -0,0 +1,246 @@
+"""
+GymPro Member Stats
+===================
+``member_stats`` holds one compact activity summary per member, keyed by the
+member id:
+
+    {_id: <member_id>, owner_id, visits, first_visit, last_visit, streak,
+     best_streak, payments, lifetime_spend, last_payment, orders, store_spend,
+     last_order, updated_at}
+
+``streak`` is the run of consecutive visit days ending at ``last_visit``; it
+only counts as the member's current streak while ``last_visit`` is today or
+yesterday (see ``current_streak``). Check-ins, payments and orders update the
+document atomically as they are written, so the member home screen, the
+member overview and reminder targeting read one document instead of scanning
+``attendance``, ``payments`` and ``orders``. A check-in backdated before the
+member's last visit counts as a visit but leaves the streak alone until the
+next rebuild, which is safe to run while the API serves writes (see
+``counters.py``).
+
+Usage:
+    python member_stats.py --rebuild                 # rebuild every member
+    python member_stats.py --rebuild --owner <id>    # rebuild one owner's members
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date, datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from database import get_db
+from counters import COUNTER_PROJECTION, bump, counted, live_rebuild, rebuild_scope
+from rollups import paid_counted
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "gympro")
+
+REBUILD_BATCH_SIZE = 500
+
+EMPTY_STATS = {
+    "visits": 0, "first_visit": None, "last_visit": None, "streak": 0, "best_streak": 0,
+    "payments": 0, "lifetime_spend": 0, "last_payment": None,
+    "orders": 0, "store_spend": 0, "last_order": None,
+}
+
+
+async def _update(member_id: str, update, event_id: ObjectId):
+    try:
+        await bump(get_db().member_stats, {"_id": member_id}, update, [event_id])
+    except Exception as e:
+        # Stats can be rebuilt from raw data; never fail the write path over them
+        print(f"⚠️  member_stats update failed for {member_id}: {e}")
+
+
+async def record_member_visit(owner_id: str, member_id: str, day: str, attendance_id: ObjectId):
+    try:
+        previous = (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+    except ValueError:
+        return  # not a calendar day; the rebuild skips these too
+    last_visit = {"$ifNull": ["$last_visit", ""]}
+    # Pipeline update: every expression sees the document as it was before this visit
+    await _update(member_id, [
+        {"$set": {
+            "owner_id": owner_id,
+            "visits": {"$add": [{"$ifNull": ["$visits", 0]}, 1]},
+            "first_visit": {"$min": [{"$ifNull": ["$first_visit", day]}, day]},
+            "last_visit": {"$max": [last_visit, day]},
+            "streak": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": [last_visit, previous]}, "then": {"$add": [{"$ifNull": ["$streak", 0]}, 1]}},
+                    {"case": {"$gte": [last_visit, day]}, "then": {"$ifNull": ["$streak", 1]}},
+                ],
+                "default": 1,
+            }},
+            "updated_at": datetime.utcnow(),
+        }},
+        {"$set": {"best_streak": {"$max": [{"$ifNull": ["$best_streak", 0]}, "$streak"]}}},
+    ], attendance_id)
+
+
+async def record_member_payment(owner_id: str, member_id: str, day: str, amount: float, paid_id: ObjectId):
+    await _update(member_id, {
+        "$set": {"owner_id": owner_id, "updated_at": datetime.utcnow()},
+        "$inc": {"payments": 1, "lifetime_spend": amount},
+        "$max": {"last_payment": day},
+    }, paid_id)
+
+
+async def record_member_order(owner_id: str, member_id: str, day: str, total: float, order_id: ObjectId):
+    await _update(member_id, {
+        "$set": {"owner_id": owner_id, "updated_at": datetime.utcnow()},
+        "$inc": {"orders": 1, "store_spend": total},
+        "$max": {"last_order": day},
+    }, order_id)
+
+
+async def delete_member_stats(member_id: str):
+    await get_db().member_stats.delete_one({"_id": member_id})
+
+
+def current_streak(stats: dict, today: date = None) -> int:
+    """The streak still running today: 0 once a full day has passed without a visit."""
+    today = today or date.today()
+    last_visit = stats.get("last_visit")
+    if not last_visit or last_visit < (today - timedelta(days=1)).isoformat():
+        return 0
+    return stats.get("streak", 0)
+
+
+def stats_to_out(doc: dict) -> dict:
+    """A ``member_stats`` document (or None) with defaults filled and the current streak resolved."""
+    stats = {**EMPTY_STATS, **{k: v for k, v in (doc or {}).items() if k in EMPTY_STATS}}
+    stats["current_streak"] = current_streak(stats)
+    return stats
+
+
+async def read_member_stats(member_id: str) -> dict:
+    return stats_to_out(await get_db().member_stats.find_one({"_id": member_id}, COUNTER_PROJECTION))
+
+
+# ─── Rebuild ──────────────────────────────────────────────────────────────────
+
+def _visit_summary(days: list) -> dict:
+    """Visit fields for one member from their visit days in ascending order."""
+    run = best = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        best = max(best, run)
+        previous = day
+    return {
+        "visits": len(days),
+        "first_visit": days[0].isoformat(),
+        "last_visit": days[-1].isoformat(),
+        "streak": run,
+        "best_streak": best,
+    }
+
+
+async def _batch_stats(db, member_ids: list, watermark: ObjectId, applied: list) -> dict:
+    """Recounted stats for ``member_ids``, keyed by ``(member_id,)``."""
+    match = {"member_id": {"$in": member_ids}}
+    stats: dict = {}
+
+    def doc_for(row_owner, member_id):
+        return stats.setdefault((member_id,), {"owner_id": row_owner, "updated_at": datetime.utcnow()})
+
+    visits: dict = {}
+    cursor = db.attendance.find(
+        {**match, **counted(watermark, applied)}, {"owner_id": 1, "member_id": 1, "date": 1}
+    ).sort([("member_id", 1), ("date", 1)])
+    async for doc in cursor:
+        try:
+            day = date.fromisoformat(doc["date"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        visits.setdefault((doc.get("owner_id"), doc["member_id"]), []).append(day)
+    for (owner_id, member_id), days in visits.items():
+        doc_for(owner_id, member_id).update(_visit_summary(days))
+
+    sources = [
+        ("payments", paid_counted(watermark, applied), "$amount",
+         lambda row: {"payments": row["count"], "lifetime_spend": row["amount"], "last_payment": row["last"]}),
+        ("orders", counted(watermark, applied), "$total",
+         lambda row: {"orders": row["count"], "store_spend": row["amount"], "last_order": row["last"]}),
+    ]
+    for collection, events, amount, to_fields in sources:
+        pipeline = [
+            {"$match": {**match, **events}},
+            {"$group": {
+                "_id": {"owner_id": "$owner_id", "member_id": "$member_id"},
+                "count": {"$sum": 1},
+                "amount": {"$sum": amount},
+                "last": {"$max": "$date"},
+            }},
+        ]
+        async for row in db[collection].aggregate(pipeline):
+            doc_for(row["_id"].get("owner_id"), row["_id"]["member_id"]).update(to_fields(row))
+    return stats
+
+
+async def rebuild_member_stats(db, owner_id: str = None) -> int:
+    """Recompute ``member_stats`` from raw data for one owner's members, or everyone's.
+
+    Safe to run while the API is serving writes (see ``counters.py``).
+    """
+    match = {"owner_id": owner_id} if owner_id else {"owner_id": {"$exists": True}}
+    member_ids = [str(doc["_id"]) async for doc in db.members.find(match, {"_id": 1})]
+
+    written = 0
+    async with live_rebuild(db.member_stats) as watermark:
+        for i in range(0, len(member_ids), REBUILD_BATCH_SIZE):
+            batch = member_ids[i:i + REBUILD_BATCH_SIZE]
+            written += await rebuild_scope(
+                db.member_stats, {"_id": {"$in": batch}}, ("_id",),
+                lambda watermark, applied, batch=batch: _batch_stats(db, batch, watermark, applied),
+                watermark, "member_stats",
+            )
+    print(f"   ✅ member_stats rebuilt for {len(member_ids)} member(s)")
+
+    # Summaries of members that no longer exist. Members created during the
+    # rebuild aren't in member_ids, so check the candidates against members now
+    known = set(member_ids)
+    candidates = [doc["_id"] async for doc in db.member_stats.find(match, {"_id": 1}) if doc["_id"] not in known]
+    existing = set()
+    for i in range(0, len(candidates), REBUILD_BATCH_SIZE):
+        oids = [ObjectId(c) for c in candidates[i:i + REBUILD_BATCH_SIZE] if ObjectId.is_valid(c)]
+        existing.update([str(doc["_id"]) async for doc in db.members.find({"_id": {"$in": oids}}, {"_id": 1})])
+    orphans = [c for c in candidates if c not in existing]
+    if orphans:
+        await db.member_stats.delete_many({"_id": {"$in": orphans}})
+        print(f"   🧹 removed {len(orphans)} summaries of deleted members")
+    return written
+
+
+async def main(owner_id: str) -> int:
+    if not MONGODB_URL:
+        print("❌  Please set MONGODB_URL in your .env file first!")
+        return 2
+
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client[DATABASE_NAME]
+    try:
+        print(f"📊 Rebuilding member_stats for {'owner ' + owner_id if owner_id else 'all owners'}...")
+        written = await rebuild_member_stats(db, owner_id)
+    finally:
+        client.close()
+    print(f"🎉 member_stats rebuilt ({written} updates applied)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the GymPro member_stats summaries")
+    parser.add_argument("--rebuild", action="store_true", help="recompute member stats from raw collections")
+    parser.add_argument("--owner", help="limit the rebuild to one owner's members")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        sys.exit(1)
+    sys.exit(asyncio.run(main(args.owner)))
@@ -0,0 +1,98 @@
+"""
+GymPro Schema Migrations
+========================
+Versioned, online data migrations. Each migration is a module in this package
+exposing ``ID``, ``DESCRIPTION`` and ``async def up(db, batch_size)``, listed
+in ``MIGRATIONS`` in the order they must run. Progress is recorded in the
+``schema_migrations`` collection:
+
+    {_id: <migration id>, description, started_at, applied_at, checkpoints: {<collection>: <last _id>}}
+
+Backfills walk each collection in ``_id`` order and save a checkpoint after
+every batch, so an interrupted run picks up where it stopped. The API keeps
+serving while a migration runs; write paths already populate new fields, so
+the backfill only has to cover documents written before the deploy.
+
+Usage:
+    python -m migrations                     # list applied and pending migrations
+    python -m migrations --apply             # run every pending migration
+    python -m migrations --apply --batch-size 500
+"""
+
+import inspect
+from datetime import datetime
+from pymongo import UpdateOne
+
+from migrations import m0001_bson_dates, m0002_search_tokens, m0003_media_refs, m0004_member_stats, m0005_daily_stats
+
+MIGRATIONS = [
+    m0001_bson_dates, m0002_search_tokens, m0003_media_refs, m0004_member_stats, m0005_daily_stats,
+]
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+async def migration_status(db) -> list:
+    """``(migration, record_or_None)`` for every registered migration, in order."""
+    records = {doc["_id"]: doc async for doc in db.schema_migrations.find({})}
+    return [(migration, records.get(migration.ID)) for migration in MIGRATIONS]
+
+
+async def pending_migrations(db) -> list:
+    return [m for m, record in await migration_status(db) if not (record and record.get("applied_at"))]
+
+
+async def run_migrations(db, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """Apply every pending migration in order; returns the ids that were applied."""
+    applied = []
+    for migration in await pending_migrations(db):
+        print(f"🚚 Running {migration.ID}: {migration.DESCRIPTION}")
+        await db.schema_migrations.update_one(
+            {"_id": migration.ID},
+            {
+                "$set": {"description": migration.DESCRIPTION},
+                "$setOnInsert": {"started_at": datetime.utcnow(), "applied_at": None, "checkpoints": {}},
+            },
+            upsert=True,
+        )
+        await migration.up(db, batch_size)
+        await db.schema_migrations.update_one(
+            {"_id": migration.ID}, {"$set": {"applied_at": datetime.utcnow()}}
+        )
+        print(f"   ✅ {migration.ID} applied")
+        applied.append(migration.ID)
+    return applied
+
+
+async def backfill(db, migration_id: str, collection: str, query: dict, to_set, batch_size: int) -> int:
+    """Resumably ``$set`` ``to_set(doc)`` on every document matching ``query``.
+
+    Documents are visited in ``_id`` order starting after the collection's
+    saved checkpoint. ``to_set`` may be async, and may return an empty dict
+    to skip a document.
+    """
+    record = await db.schema_migrations.find_one({"_id": migration_id}) or {}
+    last_id = record.get("checkpoints", {}).get(collection)
+
+    updated = 0
+    while True:
+        batch_query = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+        docs = await db[collection].find(batch_query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        writes = []
+        for doc in docs:
+            fields = to_set(doc)
+            if inspect.isawaitable(fields):
+                fields = await fields
+            if fields:
+                writes.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if writes:
+            await db[collection].bulk_write(writes, ordered=False)
+            updated += len(writes)
+        last_id = docs[-1]["_id"]
+        await db.schema_migrations.update_one(
+            {"_id": migration_id}, {"$set": {f"checkpoints.{collection}": last_id}}
+        )
+    print(f"   ✅ {collection}: {updated} document(s) updated")
+    return updated
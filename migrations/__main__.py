@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import sys
+
+from database import MONGODB_URL, close_db, connect_db, get_db
+from migrations import DEFAULT_BATCH_SIZE, migration_status, run_migrations
+
+
+async def main(apply: bool, batch_size: int) -> int:
+    if not MONGODB_URL:
+        print("❌  Please set MONGODB_URL in your .env file first!")
+        return 2
+
+    # Connect through database.py so helpers that call get_db() (e.g. the media store) work here too
+    await connect_db()
+    db = get_db()
+    try:
+        if apply:
+            applied = await run_migrations(db, batch_size)
+            print(f"🎉 {len(applied)} migration(s) applied" if applied else "✅ Database is up to date")
+            return 0
+
+        pending = 0
+        for migration, record in await migration_status(db):
+            if record and record.get("applied_at"):
+                print(f"   ✅ {migration.ID} applied {record['applied_at']:%Y-%m-%d %H:%M}")
+            else:
+                pending += 1
+                state = "in progress" if record else "pending"
+                print(f"   ⏳ {migration.ID} {state} — {migration.DESCRIPTION}")
+        if pending:
+            print(f"\n{pending} migration(s) pending. Run `python -m migrations --apply`.")
+        return 1 if pending else 0
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Run GymPro schema migrations")
+    parser.add_argument("--apply", action="store_true", help="run every pending migration")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per backfill batch")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.apply, args.batch_size)))
@@ -0,0 +1,23 @@
+"""
+Add BSON datetime companions to the ISO-string date fields (see ``dates.py``).
+"""
+
+from dates import BSON_DATES_MIGRATION, date_fields
+
+ID = BSON_DATES_MIGRATION
+DESCRIPTION = "Backfill date_at / joining_at / expiry_at / check_in_at datetimes"
+
+# collection -> datetime field whose absence marks a document as not yet migrated
+TARGETS = {
+    "payments": "date_at",
+    "attendance": "date_at",
+    "orders": "date_at",
+    "members": "expiry_at",
+}
+
+
+async def up(db, batch_size: int):
+    from migrations import backfill
+
+    for collection, marker in TARGETS.items():
+        await backfill(db, ID, collection, {marker: {"$exists": False}}, date_fields, batch_size)
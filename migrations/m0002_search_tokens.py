@@ -0,0 +1,19 @@
+"""
+Add ``search_tokens`` to existing members and supplements (see ``search.py``).
+"""
+
+from functools import partial
+
+from search import SEARCH_FIELD, SEARCH_FIELDS, SEARCH_TOKENS_MIGRATION, search_fields
+
+ID = SEARCH_TOKENS_MIGRATION
+DESCRIPTION = "Backfill search_tokens on members and supplements"
+
+
+async def up(db, batch_size: int):
+    from migrations import backfill
+
+    for collection in SEARCH_FIELDS:
+        await backfill(
+            db, ID, collection, {SEARCH_FIELD: {"$exists": False}}, partial(search_fields, collection), batch_size
+        )
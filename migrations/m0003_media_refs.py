@@ -0,0 +1,36 @@
+"""
+Move inline ``data:`` avatars and supplement images into the media store
+(see ``media.py``), leaving ``/media/<sha256>`` references behind.
+"""
+
+from fastapi import HTTPException
+
+from media import externalize
+
+ID = "0003_media_refs"
+DESCRIPTION = "Move inline avatar / image data URLs into the media store"
+
+# collection -> field holding an image
+TARGETS = {
+    "members": "avatar",
+    "supplements": "image",
+    "users": "avatar",
+}
+
+
+def _externalizer(collection: str, field: str):
+    async def to_set(doc: dict) -> dict:
+        try:
+            return {field: await externalize(doc[field])}
+        except HTTPException as e:
+            print(f"   ⚠️  {collection} {doc['_id']}: {e.detail}; left inline")
+            return {}
+    return to_set
+
+
+async def up(db, batch_size: int):
+    from migrations import backfill
+
+    for collection, field in TARGETS.items():
+        query = {field: {"$regex": "^data:", "$options": "i"}}
+        await backfill(db, ID, collection, query, _externalizer(collection, field), batch_size)
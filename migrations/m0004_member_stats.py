@@ -0,0 +1,14 @@
+"""
+Build ``member_stats`` from existing attendance, payments and orders (see
+``member_stats.py``). An interrupted run simply runs again, and it is safe to
+run while the API serves writes.
+"""
+
+from member_stats import rebuild_member_stats
+
+ID = "0004_member_stats"
+DESCRIPTION = "Build per-member activity summaries in member_stats"
+
+
+async def up(db, batch_size: int):
+    await rebuild_member_stats(db)
@@ -0,0 +1,14 @@
+"""
+Backfill ``daily_stats`` from existing payments, check-ins, members and orders
+(see ``rollups.py``), so reports keep the history from before the rollups
+existed. Safe to run while the API serves writes.
+"""
+
+from rollups import rebuild_daily_stats
+
+ID = "0005_daily_stats"
+DESCRIPTION = "Backfill daily_stats rollups from raw history"
+
+
+async def up(db, batch_size: int):
+    await rebuild_daily_stats(db)
@@ -1,5 +1,10 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, Literal
+from typing import List, Optional, Literal
+
+from models.plan import PlanOut
+from models.payment import PaymentOut
+from models.attendance import AttendanceOut
+from models.order import OrderOut
 
 
 class MemberCreate(BaseModel):
@@ -68,3 +73,55 @@ class MemberOut(BaseModel):
 
     class Config:
         populate_by_name = True
+
+
+class MemberListOut(BaseModel):
+    """A member row trimmed to the requested ``fields`` (unrequested fields are omitted)."""
+    id: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    joining_date: Optional[str] = None
+    expiry_date: Optional[str] = None
+    plan_id: Optional[str] = None
+    status: Optional[str] = None
+    avatar: Optional[str] = None
+    due_amount: Optional[float] = None
+    paid_amount: Optional[float] = None
+    emergency_contact: Optional[str] = None
+    blood_group: Optional[str] = None
+    height: Optional[float] = None
+    weight: Optional[float] = None
+    goal: Optional[str] = None
+
+
+class MemberStatsOut(BaseModel):
+    visits: int = 0
+    first_visit: Optional[str] = None
+    last_visit: Optional[str] = None
+    current_streak: int = 0             # consecutive visit days up to today/yesterday
+    best_streak: int = 0
+    payments: int = 0
+    lifetime_spend: float = 0
+    last_payment: Optional[str] = None
+    orders: int = 0
+    store_spend: float = 0
+    last_order: Optional[str] = None
+
+
+class MemberMonthAttendance(BaseModel):
+    month: str                          # YYYY-MM
+    visits: int
+    last_visit: Optional[str] = None    # most recent visit overall, not just this month
+    records: List[AttendanceOut] = []
+
+
+class MemberOverview(BaseModel):
+    """Everything the owner's member detail page shows, from one request."""
+    member: MemberOut
+    plan: Optional[PlanOut] = None
+    payments: List[PaymentOut] = []
+    attendance: MemberMonthAttendance
+    orders: List[OrderOut] = []
+    stats: MemberStatsOut = MemberStatsOut()
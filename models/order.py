@@ -25,3 +25,16 @@ class OrderOut(BaseModel):
 
     class Config:
         populate_by_name = True
+
+
+class OrderListOut(BaseModel):
+    """An order row trimmed to the requested ``fields`` (unrequested fields are omitted)."""
+    id: str
+    member_id: Optional[str] = None
+    items: Optional[List[OrderItem]] = None
+    total: Optional[float] = None
+    date: Optional[str] = None
+    status: Optional[str] = None
+    payment_status: Optional[str] = None
+    razorpay_order_id: Optional[str] = None
+    razorpay_payment_id: Optional[str] = None
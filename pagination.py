@@ -0,0 +1,98 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A page is fetched by continuing from the sort key of the last row already
+seen, so Mongo walks the (owner_id, <sort field>, _id) index instead of
+skipping rows. List bodies stay plain JSON arrays; paging metadata travels in
+response headers:
+
+    X-Next-Cursor   opaque cursor for the next page (absent on the last page)
+    X-Total-Count   total matching rows, only when ``include_total=true``
+"""
+
+import asyncio
+import base64
+import json
+from bson import ObjectId
+from fastapi import HTTPException, Query, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+# Matches the old fixed 1000-row lists, so clients that ignore X-Next-Cursor keep getting as much as before
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+
+
+class PageParams:
+    """Query parameters shared by every paginated list endpoint."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str = Query(None),
+        include_total: bool = Query(False),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.include_total = include_total
+
+
+def encode_cursor(doc: dict, field: str) -> str:
+    raw = json.dumps([doc.get(field), str(doc["_id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, oid = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(query: dict, field: str, direction: int, cursor: str) -> dict:
+    """Restrict ``query`` to rows that sort after ``cursor``."""
+    value, oid = decode_cursor(cursor)
+    op = "$gt" if direction == 1 else "$lt"
+    keyset = {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: oid}},
+    ]}
+    return {"$and": [query, keyset]}
+
+
+async def paginate(
+    collection,
+    query: dict,
+    field: str,
+    direction: int,
+    page: PageParams,
+    response: Response,
+    projection: dict = None,
+) -> list:
+    """Fetch one page of ``collection`` sorted by ``field`` then ``_id``.
+
+    Sets the paging headers on ``response`` and returns the raw documents.
+    A ``projection`` must include ``field`` so the next cursor can be built.
+    """
+    page_query = after_cursor(query, field, direction, page.cursor) if page.cursor else query
+    find = (
+        collection.find(page_query, projection)
+        .sort([(field, direction), ("_id", direction)])
+        .limit(page.limit + 1)
+    )
+    if page.include_total:
+        docs, total = await asyncio.gather(
+            find.to_list(page.limit + 1),
+            collection.count_documents(query),
+        )
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+    else:
+        docs = await find.to_list(page.limit + 1)
+
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1], field)
+    return docs
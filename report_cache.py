@@ -0,0 +1,213 @@
+"""
+Per-owner cache for dashboard and report responses.
+
+Every owner has a version counter. Cached entries remember the version they
+were computed under and are only served while it is still current, so any
+write that bumps the owner's version (payments, attendance, members, orders,
+plans, supplements) invalidates all of that owner's cached reports at once.
+Entries also expire after REPORT_CACHE_TTL_SECONDS.
+
+Writes can also name the scopes they touch (``invalidate_owner(owner_id,
+"plans")``). Each scope keeps its own counter next to the owner-wide one, so
+conditional GETs on narrow resources (see ``conditional.py``) stay valid
+across unrelated writes such as check-ins. ``invalidate_all`` bumps a global
+epoch that is part of every version, so it also covers owners that have never
+written anything. Report keys include the current date, so reports about
+"today" are recomputed after midnight.
+
+REPORT_CACHE_BACKEND selects where entries and versions live:
+
+    memory  (default) in-process dicts; each worker caches independently
+    mongo   ``report_cache`` / ``cache_versions`` collections shared by all
+            workers, for deployments running several uvicorn workers
+"""
+
+import asyncio
+import functools
+import os
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+from dotenv import load_dotenv
+
+from database import get_db
+from singleflight import SingleFlight
+
+load_dotenv()
+
+REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory")
+REPORT_CACHE_TTL_SECONDS = int(os.getenv("REPORT_CACHE_TTL_SECONDS", "60"))
+MEMORY_CACHE_MAX_ENTRIES = 5000
+# cache_versions key whose counter is bumped by invalidate_all
+GLOBAL_VERSION_KEY = "_all"
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        self._versions: dict = {}
+        self._entries: dict = {}
+        self._epoch = 0
+
+    async def lookup(self, owner_id: str, key: str):
+        """Return ``(current_version, cached_value_or_None)``."""
+        version = await self.version(owner_id)
+        entry = self._entries.get((owner_id, key))
+        if entry and entry[0] == version and entry[1] > time.monotonic():
+            return version, entry[2]
+        return version, None
+
+    async def store(self, owner_id: str, key: str, version: str, value, ttl: int):
+        if len(self._entries) >= MEMORY_CACHE_MAX_ENTRIES:
+            # Evict the oldest entry (dicts keep insertion order)
+            self._entries.pop(next(iter(self._entries)))
+        self._entries.pop((owner_id, key), None)
+        self._entries[(owner_id, key)] = (version, time.monotonic() + ttl, value)
+
+    async def version(self, key: str) -> str:
+        return f"{self._epoch}.{self._versions.get(key, 0)}"
+
+    async def bump(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    async def bump_all(self):
+        self._epoch += 1
+        self._entries.clear()
+
+
+class MongoBackend:
+    name = "mongo"
+
+    async def lookup(self, owner_id: str, key: str):
+        version, entry = await asyncio.gather(
+            self.version(owner_id),
+            get_db().report_cache.find_one({"_id": f"{owner_id}|{key}"}),
+        )
+        if entry and entry["version"] == version and entry["expires_at"] > datetime.utcnow():
+            return version, entry["value"]
+        return version, None
+
+    async def store(self, owner_id: str, key: str, version: str, value, ttl: int):
+        await get_db().report_cache.replace_one(
+            {"_id": f"{owner_id}|{key}"},
+            {
+                "owner_id": owner_id,
+                "version": version,
+                "value": value,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+            },
+            upsert=True,
+        )
+
+    async def version(self, key: str) -> str:
+        docs = await get_db().cache_versions.find({"_id": {"$in": [key, GLOBAL_VERSION_KEY]}}).to_list(2)
+        versions = {doc["_id"]: doc["version"] for doc in docs}
+        return f"{versions.get(GLOBAL_VERSION_KEY, 0)}.{versions.get(key, 0)}"
+
+    async def bump(self, key: str):
+        await get_db().cache_versions.update_one({"_id": key}, {"$inc": {"version": 1}}, upsert=True)
+
+    async def bump_all(self):
+        await get_db().cache_versions.update_one({"_id": GLOBAL_VERSION_KEY}, {"$inc": {"version": 1}}, upsert=True)
+
+
+BACKENDS = {"memory": MemoryBackend, "mongo": MongoBackend}
+
+backend = BACKENDS.get(REPORT_CACHE_BACKEND, MemoryBackend)()
+
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+
+report_flights = SingleFlight()
+
+
+def report_key(name: str, params: dict) -> str:
+    query = urlencode(sorted((k, '' if v is None else v) for k, v in params.items()))
+    # "Today", "this month" and expiry windows move at midnight
+    return f"{name}@{date.today().isoformat()}?{query}"
+
+
+def cached_owner_report(name: str):
+    """Cache an owner-scoped report endpoint keyed by owner and query params.
+
+    The endpoint must take the owner dependency as ``_owner``; every other
+    argument is treated as a query parameter and becomes part of the key.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            owner_id = kwargs["_owner"]["owner_id"]
+            key = report_key(name, {k: v for k, v in kwargs.items() if k != "_owner"})
+            try:
+                version, value = await backend.lookup(owner_id, key)
+            except Exception as e:
+                print(f"⚠️  Report cache lookup failed: {e}")
+                _stats["errors"] += 1
+                return await endpoint(**kwargs)
+            if value is not None:
+                _stats["hits"] += 1
+                return value
+
+            _stats["misses"] += 1
+
+            async def compute():
+                value = await endpoint(**kwargs)
+                try:
+                    # Stored under the version read *before* computing, so a write that
+                    # lands mid-computation makes this entry stale instead of hiding the write
+                    await backend.store(owner_id, key, version, value, REPORT_CACHE_TTL_SECONDS)
+                except Exception as e:
+                    print(f"⚠️  Report cache store failed: {e}")
+                    _stats["errors"] += 1
+                return value
+
+            # Concurrent identical misses share one computation; the version is part
+            # of the key so requests arriving after a write never join an older run
+            return await report_flights.do((owner_id, key, version), compute)
+        return wrapper
+    return decorator
+
+
+def scope_key(owner_id: str, scope: str = None) -> str:
+    return f"{owner_id}:{scope}" if scope else owner_id
+
+
+async def invalidate_owner(owner_id: str, *scopes: str):
+    """Call after any write that can change an owner's dashboard or reports.
+
+    ``scopes`` name the narrower resources the write changed (``"plans"``,
+    ``"supplements"``, ``"settings"``, ``"members"``).
+    """
+    try:
+        await backend.bump(owner_id)
+        for scope in scopes:
+            await backend.bump(scope_key(owner_id, scope))
+        _stats["invalidations"] += 1
+    except Exception as e:
+        print(f"⚠️  Report cache invalidation failed for {owner_id}: {e}")
+        _stats["errors"] += 1
+
+
+async def owner_version(owner_id: str, scope: str = None) -> str:
+    """Opaque version of an owner's data (or one scope of it); changes on every relevant write."""
+    return await backend.version(scope_key(owner_id, scope))
+
+
+async def invalidate_all():
+    try:
+        await backend.bump_all()
+        _stats["invalidations"] += 1
+    except Exception as e:
+        print(f"⚠️  Report cache invalidation failed: {e}")
+        _stats["errors"] += 1
+
+
+def report_cache_metrics() -> dict:
+    hits, misses = _stats["hits"], _stats["misses"]
+    return {
+        "backend": backend.name,
+        "ttl_seconds": REPORT_CACHE_TTL_SECONDS,
+        **_stats,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "single_flight": report_flights.metrics(),
+    }
@@ -0,0 +1,231 @@
+"""
+GymPro Daily Rollups
+====================
+``daily_stats`` holds one small document per owner per day:
+
+    {owner_id, date, revenue, payments, revenue_by_method: {<method>: amount},
+     checkins, checkins_by_hour: {<HH>: count}, new_members, orders, units, order_revenue}
+
+The write paths (payments, Razorpay verifiers, check-in, orders, new members)
+bump it with ``$inc`` upserts, so reports read a few hundred rollup documents
+instead of rescanning raw history. Migration ``0005_daily_stats`` backfills
+history from the raw collections; run the rebuild any time the rollups are
+suspected to be off. It is safe to run while the API serves writes (see
+``counters.py``).
+
+Usage:
+    python rollups.py --rebuild                 # rebuild every owner
+    python rollups.py --rebuild --owner <id>    # rebuild a single owner
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from database import get_db
+from counters import COUNTER_PROJECTION, bump, counted, live_rebuild, rebuild_scope
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "gympro")
+
+
+def method_key(method: str) -> str:
+    # Field names can't contain dots or start with "$"
+    return (method or "Cash").replace(".", "_").lstrip("$") or "Cash"
+
+
+async def _bump(owner_id: str, day: str, inc: dict, event_ids: list):
+    try:
+        await bump(get_db().daily_stats, {"owner_id": owner_id, "date": day}, {"$inc": inc}, event_ids)
+    except Exception as e:
+        # Rollups can be rebuilt from raw data; never fail the write path over them
+        print(f"⚠️  daily_stats update failed for {owner_id} {day}: {e}")
+
+
+async def record_payment(owner_id: str, day: str, amount: float, method: str, paid_id: ObjectId):
+    await _bump(owner_id, day, {
+        "revenue": amount,
+        "payments": 1,
+        f"revenue_by_method.{method_key(method)}": amount,
+    }, [paid_id])
+
+
+def hour_key(check_in) -> str:
+    """``"07"`` for a ``"07:45"`` check-in time; None when it has no usable hour."""
+    hour = str(check_in or "")[:2]
+    return hour if hour.isdigit() and int(hour) < 24 else None
+
+
+async def record_checkin(owner_id: str, day: str, check_in: str, attendance_id: ObjectId):
+    inc = {"checkins": 1}
+    if hour_key(check_in):
+        inc[f"checkins_by_hour.{hour_key(check_in)}"] = 1
+    await _bump(owner_id, day, inc, [attendance_id])
+
+
+async def record_new_member(owner_id: str, day: str, member_ids: list):
+    """Count new members; a bulk import passes its ids grouped by ``counters.same_second``."""
+    await _bump(owner_id, day, {"new_members": len(member_ids)}, member_ids)
+
+
+async def record_order(owner_id: str, day: str, items: list, total: float, order_id: ObjectId):
+    await _bump(owner_id, day, {
+        "orders": 1,
+        "units": sum(item["quantity"] for item in items),
+        "order_revenue": total,
+    }, [order_id])
+
+
+async def read_daily_stats(owner_id: str, first: str, last: str) -> dict:
+    """Rollup documents for ``first``..``last`` (inclusive ISO dates), keyed by date."""
+    docs = await get_db().daily_stats.find(
+        {"owner_id": owner_id, "date": {"$gte": first, "$lte": last}}, COUNTER_PROJECTION
+    ).to_list(None)
+    return {doc["date"]: doc for doc in docs}
+
+
+# ─── Rebuild ──────────────────────────────────────────────────────────────────
+
+def paid_counted(watermark: ObjectId, applied: list) -> dict:
+    """Paid payments a rebuild counts (see ``counters.counted``); older payments without ``paid_id`` use ``_id``."""
+    return {"status": "paid", "$or": [
+        *counted(watermark, applied, "paid_id")["$or"],
+        {"paid_id": {"$exists": False}, "_id": {"$lt": watermark}},
+    ]}
+
+
+def _rebuild_sources(owner_id: str, watermark: ObjectId, applied: list) -> list:
+    """(collection, pipeline, to_fields) triples that recompute every rollup field of one owner."""
+    match = {"owner_id": owner_id}
+    return [
+        (
+            "payments",
+            [
+                {"$match": {**match, **paid_counted(watermark, applied)}},
+                {"$group": {
+                    "_id": {"date": "$date", "method": {"$ifNull": ["$method", "Cash"]}},
+                    "amount": {"$sum": "$amount"},
+                    "count": {"$sum": 1},
+                }},
+            ],
+            lambda row: {
+                "revenue": row["amount"],
+                "payments": row["count"],
+                f"revenue_by_method.{method_key(row['_id']['method'])}": row["amount"],
+            },
+        ),
+        (
+            "attendance",
+            [
+                {"$match": {**match, **counted(watermark, applied)}},
+                {"$group": {
+                    "_id": {"date": "$date", "hour": {"$substrBytes": ["$check_in", 0, 2]}},
+                    "count": {"$sum": 1},
+                }},
+            ],
+            lambda row: {
+                "checkins": row["count"],
+                **({f"checkins_by_hour.{hour_key(row['_id'].get('hour'))}": row["count"]}
+                   if hour_key(row["_id"].get("hour")) else {}),
+            },
+        ),
+        (
+            "members",
+            [
+                {"$match": {**match, **counted(watermark, applied)}},
+                {"$group": {"_id": {"date": "$joining_date"}, "count": {"$sum": 1}}},
+            ],
+            lambda row: {"new_members": row["count"]},
+        ),
+        (
+            "orders",
+            [
+                {"$match": {**match, **counted(watermark, applied)}},
+                {"$group": {
+                    "_id": {"date": "$date"},
+                    "count": {"$sum": 1},
+                    "units": {"$sum": {"$sum": "$items.quantity"}},
+                    "revenue": {"$sum": "$total"},
+                }},
+            ],
+            lambda row: {"orders": row["count"], "units": row["units"], "order_revenue": row["revenue"]},
+        ),
+    ]
+
+
+def _add(doc: dict, path: str, value):
+    """``$inc`` semantics for a dotted ``path`` on a plain dict."""
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = doc.get(leaf, 0) + value
+
+
+async def _owner_rollups(db, owner_id: str, watermark: ObjectId, applied: list) -> dict:
+    days: dict = {}
+    for collection, pipeline, to_fields in _rebuild_sources(owner_id, watermark, applied):
+        async for row in db[collection].aggregate(pipeline, allowDiskUse=True):
+            if not row["_id"].get("date"):
+                continue
+            doc = days.setdefault((owner_id, row["_id"]["date"]), {})
+            for path, value in to_fields(row).items():
+                _add(doc, path, value)
+    return days
+
+
+async def rebuild_daily_stats(db, owner_id: str = None) -> int:
+    """Recompute ``daily_stats`` from raw data for one owner, or all of them.
+
+    Safe to run while the API is serving writes (see ``counters.py``).
+    """
+    if owner_id:
+        owners = [owner_id]
+    else:
+        owners = set()
+        for collection in ("payments", "attendance", "members", "orders", "daily_stats"):
+            owners.update(o for o in await db[collection].distinct("owner_id") if o)
+        owners = sorted(owners)
+
+    written = 0
+    async with live_rebuild(db.daily_stats) as watermark:
+        for owner in owners:
+            written += await rebuild_scope(
+                db.daily_stats, {"owner_id": owner}, ("owner_id", "date"),
+                lambda watermark, applied, owner=owner: _owner_rollups(db, owner, watermark, applied),
+                watermark, f"daily_stats for owner {owner}",
+            )
+    print(f"   ✅ daily_stats rebuilt for {len(owners)} owner(s)")
+    return written
+
+
+async def main(owner_id: str) -> int:
+    if not MONGODB_URL:
+        print("❌  Please set MONGODB_URL in your .env file first!")
+        return 2
+
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client[DATABASE_NAME]
+    try:
+        print(f"📊 Rebuilding daily_stats for {'owner ' + owner_id if owner_id else 'all owners'}...")
+        written = await rebuild_daily_stats(db, owner_id)
+    finally:
+        client.close()
+    print(f"🎉 daily_stats rebuilt ({written} updates applied)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the GymPro daily_stats rollups")
+    parser.add_argument("--rebuild", action="store_true", help="recompute rollups from raw collections")
+    parser.add_argument("--owner", help="limit the rebuild to one owner id")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        sys.exit(1)
+    sys.exit(asyncio.run(main(args.owner)))
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from database import get_db
-from models.attendance import AttendanceCreate, AttendanceCheckout, AttendanceOut
-from auth import require_owner, get_current_user
+from models.attendance import AttendanceCreate, AttendanceCheckout, AttendanceOut, AttendanceStats
+from auth import require_owner, get_current_user, get_current_member
+from pagination import PageParams, paginate
+from rollups import read_daily_stats, record_checkin
+from member_stats import record_member_visit
+from report_cache import invalidate_owner
+from dates import date_fields, day_range
 from bson import ObjectId
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import Optional, List
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
+# Days covered by the rolling attendance rate in /attendance/stats
+STATS_WINDOW_DAYS = 30
+
 
 def attendance_doc_to_out(doc: dict) -> AttendanceOut:
     return AttendanceOut(
@@ -21,8 +30,10 @@ def attendance_doc_to_out(doc: dict) -> AttendanceOut:
 
 @router.get("", response_model=List[AttendanceOut])
 async def list_attendance(
+    response: Response,
     date_filter: Optional[str] = Query(None, alias="date"),
     member_id: Optional[str] = Query(None),
+    page: PageParams = Depends(),
     _owner=Depends(require_owner),
 ):
     db = get_db()
@@ -31,25 +42,57 @@ async def list_attendance(
         query["date"] = date_filter
     if member_id:
         query["member_id"] = member_id
-    records = await db.attendance.find(query).sort("date", -1).to_list(1000)
+    records = await paginate(db.attendance, query, "date", -1, page, response)
     return [attendance_doc_to_out(r) for r in records]
 
 
+@router.get("/stats", response_model=AttendanceStats)
+async def attendance_stats(_owner=Depends(require_owner)):
+    db = get_db()
+    owner_id = _owner["owner_id"]
+    today = date.today()
+    window_start = today - timedelta(days=STATS_WINDOW_DAYS - 1)
+
+    # Check-ins are unique per member and day, so the daily rollup counts are distinct visitors
+    total_active, rollups = await asyncio.gather(
+        db.members.count_documents({"owner_id": owner_id, "status": "active"}),
+        read_daily_stats(owner_id, window_start.isoformat(), today.isoformat()),
+    )
+    present_today = rollups.get(today.isoformat(), {}).get("checkins", 0)
+    member_days = sum(day.get("checkins", 0) for day in rollups.values())
+    by_hour = {}
+    for day in rollups.values():
+        for hour, n in (day.get("checkins_by_hour") or {}).items():
+            by_hour[hour] = by_hour.get(hour, 0) + n
+    peak = min(by_hour, key=lambda hour: (-by_hour[hour], hour)) if by_hour else None
+
+    return AttendanceStats(
+        total_active_members=total_active,
+        present_today=present_today,
+        absent_today=max(0, total_active - present_today),
+        attendance_rate_today=round(present_today / total_active * 100, 1) if total_active else 0.0,
+        attendance_rate_30d=(
+            round(member_days / (total_active * STATS_WINDOW_DAYS) * 100, 1) if total_active else 0.0
+        ),
+        peak_hour=f"{peak}:00" if peak else None,
+    )
+
+
 @router.get("/me", response_model=List[AttendanceOut])
 async def my_attendance(
     month: Optional[int] = Query(None),
     year: Optional[int] = Query(None),
-    current_user: dict = Depends(get_current_user),
+    member: dict = Depends(get_current_member),
 ):
     db = get_db()
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member profile not found")
-    member_id = str(member["_id"])
-    query: dict = {"member_id": member_id}
+    query: dict = {"member_id": member["member_id"]}
     if month and year:
-        prefix = f"{year}-{str(month).zfill(2)}"
-        query["date"] = {"$regex": f"^{prefix}"}
+        try:
+            first = date(year, month, 1)
+        except ValueError:
+            return []
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        query.update(day_range("date", first, last))
     records = await db.attendance.find(query).sort("date", -1).to_list(200)
     return [attendance_doc_to_out(r) for r in records]
 
@@ -76,10 +119,8 @@ async def check_in(body: AttendanceCreate, current_user: dict = Depends(get_curr
         check_in_time = body.check_in or now_time
     else:
         # Member checks themselves in
-        member = await db.members.find_one({"email": current_user["email"]})
-        if not member:
-            raise HTTPException(status_code=404, detail="Member profile not found")
-        member_id = str(member["_id"])
+        member = await get_current_member(current_user)
+        member_id = member["member_id"]
         target_date = today
         check_in_time = now_time
 
@@ -95,8 +136,12 @@ async def check_in(body: AttendanceCreate, current_user: dict = Depends(get_curr
         "check_in": check_in_time,
         "check_out": None,
     }
+    doc.update(date_fields(doc))
     result = await db.attendance.insert_one(doc)
     doc["_id"] = result.inserted_id
+    await record_checkin(current_user["owner_id"], target_date, check_in_time, result.inserted_id)
+    await record_member_visit(current_user["owner_id"], member_id, target_date, result.inserted_id)
+    await invalidate_owner(current_user["owner_id"])
     return attendance_doc_to_out(doc)
 
 
@@ -122,4 +167,5 @@ async def check_out(
     )
     if not result:
         raise HTTPException(status_code=404, detail="Attendance record not found or already checked out")
+    await invalidate_owner(current_user["owner_id"])
     return attendance_doc_to_out(result)
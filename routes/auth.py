@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from database import get_db
 from models.user import UserLogin, TokenResponse, UserOut, ChangePasswordRequest, UserRegister, ForgotPasswordRequest, ResetPasswordRequest
-from auth import (
-    verify_password, get_password_hash, create_access_token, get_current_user
-)
+from auth import create_access_token, get_current_user
+from hashing import hash_password, check_password
 from bson import ObjectId
 import secrets
 from datetime import datetime, timedelta
 from email_utils import send_reset_email
+from media import public_url
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -19,7 +19,7 @@ def user_doc_to_out(doc: dict) -> UserOut:
         email=doc["email"],
         role=doc["role"],
         phone=doc.get("phone"),
-        avatar=doc.get("avatar"),
+        avatar=public_url(doc.get("avatar")),
     )
 
 
@@ -36,7 +36,7 @@ async def register(body: UserRegister):
     user_doc = {
         "name": body.name,
         "email": body.email,
-        "hashed_password": get_password_hash(body.password),
+        "hashed_password": await hash_password(body.password),
         "role": "owner",
         "phone": body.phone,
         "avatar": None
@@ -79,7 +79,7 @@ async def register(body: UserRegister):
 async def login(body: UserLogin):
     db = get_db()
     user = await db.users.find_one({"email": body.email})
-    if not user or not verify_password(body.password, user["hashed_password"]):
+    if not user or not await check_password(body.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -92,6 +92,9 @@ async def login(body: UserLogin):
     }
     if user["role"] == "member":
         token_payload["owner_id"] = user.get("owner_id")
+        member = await db.members.find_one({"email": user["email"]}, {"_id": 1})
+        if member:
+            token_payload["member_id"] = str(member["_id"])
     else:
         token_payload["owner_id"] = str(user["_id"])
 
@@ -137,9 +140,9 @@ async def change_password(
     user = await db.users.find_one({"_id": ObjectId(current_user["user_id"])})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if not verify_password(body.current_password, user["hashed_password"]):
+    if not await check_password(body.current_password, user["hashed_password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
-    new_hash = get_password_hash(body.new_password)
+    new_hash = await hash_password(body.new_password)
     await db.users.update_one(
         {"_id": ObjectId(current_user["user_id"])},
         {"$set": {"hashed_password": new_hash}}
@@ -184,7 +187,7 @@ async def reset_password(body: ResetPasswordRequest):
     if not user:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
-    new_hash = get_password_hash(body.password)
+    new_hash = await hash_password(body.password)
     await db.users.update_one(
         {"_id": user["_id"]},
         {"$set": {"hashed_password": new_hash}, "$unset": {"reset_token": "", "reset_token_expiry": ""}}
@@ -1,53 +1,63 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
 from database import get_db
 from auth import require_owner
+from rollups import read_daily_stats
+from report_cache import cached_owner_report
+from dates import day_range, on_or_after_expr
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from typing import List
+from typing import List, Optional
 
 router = APIRouter(tags=["Dashboard & Reports"])
 
+# Upper bound on any month-by-month report window
+MAX_REPORT_MONTHS = 60
+# Upper bound on any day-by-day report window
+MAX_REPORT_DAYS = 366
+
 
 @router.get("/dashboard/stats")
+@cached_owner_report("dashboard/stats")
 async def dashboard_stats(_owner=Depends(require_owner)):
     db = get_db()
-    today = date.today().isoformat()
     owner_id = _owner["owner_id"]
+    first_of_month = date.today().replace(day=1)
 
-    # Auto-expire members
-    await db.members.update_many(
-        {"expiry_date": {"$lt": today}, "status": "active", "owner_id": owner_id},
-        {"$set": {"status": "expired"}}
-    )
-
-    total_members = await db.members.count_documents({"owner_id": owner_id})
-    active_members = await db.members.count_documents({"status": "active", "owner_id": owner_id})
-    expired_members = await db.members.count_documents({"status": "expired", "owner_id": owner_id})
-
-    # Revenue aggregation
+    # Member counts and pending dues in one pass over the owner's members
+    members_pipeline = [
+        {"$match": {"owner_id": owner_id}},
+        {"$facet": {
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "dues": [
+                {"$match": {"due_amount": {"$gt": 0}}},
+                {"$group": {"_id": None, "total": {"$sum": "$due_amount"}}},
+            ],
+        }},
+    ]
+    # All-time and current-month revenue in one pass over paid payments
     revenue_pipeline = [
         {"$match": {"status": "paid", "owner_id": owner_id}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": "$amount"},
+            "monthly": {"$sum": {"$cond": [on_or_after_expr("date", first_of_month), "$amount", 0]}},
+        }},
     ]
-    revenue_result = await db.payments.aggregate(revenue_pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
+    members_result, revenue_result = await asyncio.gather(
+        db.members.aggregate(members_pipeline).to_list(1),
+        db.payments.aggregate(revenue_pipeline).to_list(1),
+    )
 
-    # Pending dues: sum of all members' due_amount
-    dues_pipeline = [
-        {"$match": {"due_amount": {"$gt": 0}, "owner_id": owner_id}},
-        {"$group": {"_id": None, "total": {"$sum": "$due_amount"}}}
-    ]
-    dues_result = await db.members.aggregate(dues_pipeline).to_list(1)
-    pending_dues = dues_result[0]["total"] if dues_result else 0
-
-    # Monthly revenue (current month)
-    first_of_month = date.today().replace(day=1).isoformat()
-    monthly_pipeline = [
-        {"$match": {"status": "paid", "date": {"$gte": first_of_month}, "owner_id": owner_id}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]
-    monthly_result = await db.payments.aggregate(monthly_pipeline).to_list(1)
-    monthly_revenue = monthly_result[0]["total"] if monthly_result else 0
+    facets = members_result[0] if members_result else {"by_status": [], "dues": []}
+    status_counts = {row["_id"]: row["count"] for row in facets["by_status"]}
+    total_members = sum(status_counts.values())
+    active_members = status_counts.get("active", 0)
+    expired_members = status_counts.get("expired", 0)
+    pending_dues = facets["dues"][0]["total"] if facets["dues"] else 0
+
+    total_revenue = revenue_result[0]["total"] if revenue_result else 0
+    monthly_revenue = revenue_result[0]["monthly"] if revenue_result else 0
 
     return {
         "totalMembers": total_members,
@@ -59,77 +69,245 @@ async def dashboard_stats(_owner=Depends(require_owner)):
     }
 
 
+def parse_month(value: str, param: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"'{param}' must be in YYYY-MM format")
+
+
+def parse_day(value: str, param: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"'{param}' must be in YYYY-MM-DD format")
+
+
 @router.get("/reports/revenue")
-async def revenue_report(_owner=Depends(require_owner)):
+@cached_owner_report("reports/revenue")
+async def revenue_report(
+    months: int = Query(6, ge=1, le=MAX_REPORT_MONTHS),
+    from_month: Optional[str] = Query(None, alias="from"),
+    to_month: Optional[str] = Query(None, alias="to"),
+    _owner=Depends(require_owner),
+):
     db = get_db()
-    months = []
-    today = date.today()
-    for i in range(5, -1, -1):
-        first = (today.replace(day=1) - relativedelta(months=i))
-        label = first.strftime("%b")
-        prefix = first.strftime("%Y-%m")
-        pipeline = [
-            {"$match": {"status": "paid", "date": {"$regex": f"^{prefix}"}, "owner_id": _owner["owner_id"]}},
-            {"$group": {"_id": None, "revenue": {"$sum": "$amount"}}}
-        ]
-        result = await db.payments.aggregate(pipeline).to_list(1)
-        revenue = result[0]["revenue"] if result else 0
-        months.append({"month": label, "revenue": revenue})
-    return months
+    last = parse_month(to_month, "to") if to_month else date.today().replace(day=1)
+    first = parse_month(from_month, "from") if from_month else last - relativedelta(months=months - 1)
+    if first > last:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    span = (last.year - first.year) * 12 + last.month - first.month + 1
+    if span > MAX_REPORT_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Report window is limited to {MAX_REPORT_MONTHS} months")
+
+    # Read the daily rollups (at most one small document per day) rather than raw payments
+    pipeline = [
+        {"$match": {
+            "owner_id": _owner["owner_id"],
+            "date": {"$gte": first.isoformat(), "$lt": (last + relativedelta(months=1)).isoformat()},
+        }},
+        {"$group": {"_id": {"$substrBytes": ["$date", 0, 7]}, "revenue": {"$sum": "$revenue"}}},
+    ]
+    rows = await db.daily_stats.aggregate(pipeline).to_list(None)
+    revenue_by_month = {row["_id"]: row["revenue"] for row in rows}
+
+    result = []
+    for i in range(span):
+        month = first + relativedelta(months=i)
+        period = month.strftime("%Y-%m")
+        result.append({
+            "month": month.strftime("%b"),
+            "period": period,
+            "revenue": revenue_by_month.get(period, 0),
+        })
+    return result
 
 
 @router.get("/reports/membership")
+@cached_owner_report("reports/membership")
 async def membership_report(_owner=Depends(require_owner)):
     db = get_db()
-    plans = await db.plans.find({"owner_id": _owner["owner_id"]}).to_list(100)
+    owner_id = _owner["owner_id"]
+    pipeline = [
+        {"$match": {"owner_id": owner_id}},
+        {"$group": {"_id": "$plan_id", "value": {"$sum": 1}}},
+        # Bring in the owner's plans with a zero count so empty plans still show up
+        {"$unionWith": {"coll": "plans", "pipeline": [
+            {"$match": {"owner_id": owner_id}},
+            {"$project": {"_id": {"$toString": "$_id"}, "value": {"$literal": 0}}},
+        ]}},
+        {"$group": {"_id": "$_id", "value": {"$sum": "$value"}}},
+        {"$addFields": {"plan_oid": {
+            "$convert": {"input": "$_id", "to": "objectId", "onError": None, "onNull": None}
+        }}},
+        {"$lookup": {
+            "from": "plans",
+            "localField": "plan_oid",
+            "foreignField": "_id",
+            "as": "plan",
+        }},
+        {"$sort": {"plan_oid": 1}},
+    ]
+    rows = await db.members.aggregate(pipeline).to_list(None)
+
     result = []
-    for plan in plans:
-        count = await db.members.count_documents({"plan_id": str(plan["_id"]), "owner_id": _owner["owner_id"]})
-        result.append({"name": plan["name"], "value": count})
+    unassigned = 0
+    for row in rows:
+        plan = next((p for p in row["plan"] if p.get("owner_id") == owner_id), None)
+        if plan:
+            result.append({"name": plan["name"], "value": row["value"]})
+        else:
+            # Members whose plan was deleted, belongs elsewhere or was never set
+            unassigned += row["value"]
+    if unassigned:
+        result.append({"name": "Unassigned", "value": unassigned})
     return result
 
 
+def day_window(days: int, from_date: Optional[str], to_date: Optional[str]):
+    last = parse_day(to_date, "to") if to_date else date.today()
+    first = parse_day(from_date, "from") if from_date else last - timedelta(days=days - 1)
+    if first > last:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (last - first).days + 1 > MAX_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"Report window is limited to {MAX_REPORT_DAYS} days")
+    return first, last
+
+
+def hour_of(field: str) -> dict:
+    """Aggregation expression for the hour of an "HH:MM" field, or null if unparseable."""
+    return {"$convert": {"input": {"$substrBytes": [field, 0, 2]}, "to": "int", "onError": None, "onNull": None}}
+
+
+async def attendance_rollup(db, owner_id: str, first: date, last: date) -> dict:
+    """Daily check-in counts and an hourly heatmap for a date window in one aggregation."""
+    pipeline = [
+        {"$match": {"owner_id": owner_id, **day_range("date", first, last)}},
+        {"$facet": {
+            "daily": [{"$group": {"_id": "$date", "count": {"$sum": 1}}}],
+            # Every visit counts towards each hour between check-in and check-out (check-in hour if still inside)
+            "hourly": [
+                {"$project": {"date": 1, "start": hour_of("$check_in"), "end": hour_of({"$ifNull": ["$check_out", "$check_in"]})}},
+                {"$match": {"start": {"$ne": None}}},
+                {"$project": {"date": 1, "hour": {"$range": ["$start", {"$add": [{"$max": ["$end", "$start"]}, 1]}]}}},
+                {"$unwind": "$hour"},
+                {"$group": {"_id": {"date": "$date", "hour": "$hour"}, "count": {"$sum": 1}}},
+            ],
+        }},
+    ]
+    result = await db.attendance.aggregate(pipeline).to_list(1)
+    return result[0] if result else {"daily": [], "hourly": []}
+
+
+def daily_series(rows: list, first: date, last: date) -> list:
+    counts = {row["_id"]: row["count"] for row in rows}
+    series = []
+    for i in range((last - first).days + 1):
+        d = first + timedelta(days=i)
+        series.append({"day": d.strftime("%a"), "date": d.isoformat(), "attendance": counts.get(d.isoformat(), 0)})
+    return series
+
+
 @router.get("/reports/attendance")
-async def attendance_report(_owner=Depends(require_owner)):
+@cached_owner_report("reports/attendance")
+async def attendance_report(
+    days: int = Query(7, ge=1, le=MAX_REPORT_DAYS),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    _owner=Depends(require_owner),
+):
+    first, last = day_window(days, from_date, to_date)
+    stats = await read_daily_stats(_owner["owner_id"], first.isoformat(), last.isoformat())
+    rows = [{"_id": day, "count": doc.get("checkins", 0)} for day, doc in stats.items()]
+    return daily_series(rows, first, last)
+
+
+@router.get("/reports/attendance/heatmap")
+@cached_owner_report("reports/attendance/heatmap")
+async def attendance_heatmap(
+    days: int = Query(28, ge=1, le=MAX_REPORT_DAYS),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    _owner=Depends(require_owner),
+):
+    """Daily check-ins plus a day-of-week x hour-of-day occupancy grid for staffing."""
     db = get_db()
-    # Weekly attendance: last 7 days per day of week
-    days = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-    result = []
-    today = date.today()
-    for i in range(6, -1, -1):
-        d = today - __import__("datetime").timedelta(days=i)
-        count = await db.attendance.count_documents({"date": d.isoformat(), "owner_id": _owner["owner_id"]})
-        result.append({"day": days[d.weekday() + 1 if d.weekday() < 6 else 0], "attendance": count})
-    return result
+    first, last = day_window(days, from_date, to_date)
+    rollup = await attendance_rollup(db, _owner["owner_id"], first, last)
+
+    weekdays = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+    grid = {day: [0] * 24 for day in weekdays}
+    days_counted = {day: 0 for day in weekdays}
+    for i in range((last - first).days + 1):
+        days_counted[(first + timedelta(days=i)).strftime("%a")] += 1
+    for row in rollup["hourly"]:
+        hour = row["_id"]["hour"]
+        try:
+            day = date.fromisoformat(row["_id"]["date"]).strftime("%a")
+        except (TypeError, ValueError):
+            continue
+        if 0 <= hour < 24:
+            grid[day][hour] += row["count"]
+
+    return {
+        "from": first.isoformat(),
+        "to": last.isoformat(),
+        "daily": daily_series(rollup["daily"], first, last),
+        # Total visits present in each hour; divide by days_counted for a typical day
+        "heatmap": [
+            {"day": day, "days_counted": days_counted[day], "hours": grid[day]}
+            for day in weekdays
+        ],
+    }
 
 
 @router.get("/reports/products")
-async def products_report(_owner=Depends(require_owner)):
+@cached_owner_report("reports/products")
+async def products_report(
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    limit: int = Query(5, ge=1, le=50),
+    _owner=Depends(require_owner),
+):
     db = get_db()
-    # Aggregate sales from all orders
+    match = {"owner_id": _owner["owner_id"]}
+    first = parse_day(from_date, "from") if from_date else None
+    last = parse_day(to_date, "to") if to_date else None
+    if first or last:
+        match.update(day_range("date", first, last))
+
+    # Aggregate sales and join the supplement details in the same pipeline
     pipeline = [
-        {"$match": {"owner_id": _owner["owner_id"]}},
+        {"$match": match},
         {"$unwind": "$items"},
         {"$group": {
             "_id": "$items.supplement_id",
-            "total_sold": {"$sum": "$items.quantity"}
+            "units": {"$sum": "$items.quantity"},
+            "revenue": {"$sum": {"$multiply": ["$items.quantity", "$items.price"]}},
+        }},
+        {"$addFields": {"supplement_oid": {
+            "$convert": {"input": "$_id", "to": "objectId", "onError": None, "onNull": None}
+        }}},
+        {"$lookup": {
+            "from": "supplements",
+            "localField": "supplement_oid",
+            "foreignField": "_id",
+            "as": "supplement",
         }},
-        {"$sort": {"total_sold": -1}},
-        {"$limit": 5}
+        {"$unwind": "$supplement"},
+        {"$sort": {"units": -1, "revenue": -1}},
+        {"$limit": limit},
+    ]
+    sales = await db.orders.aggregate(pipeline).to_list(limit)
+
+    return [
+        {
+            "supplement_id": sale["_id"],
+            "name": sale["supplement"]["name"].split(' ')[0],  # Just taking first word like mock data did
+            "full_name": sale["supplement"]["name"],
+            "sales": sale["units"],
+            "units": sale["units"],
+            "revenue": round(sale["revenue"], 2),
+        }
+        for sale in sales
     ]
-    sales = await db.orders.aggregate(pipeline).to_list(5)
-    
-    result = []
-    for sale in sales:
-        from bson import ObjectId
-        try:
-            supp = await db.supplements.find_one({"_id": ObjectId(sale["_id"])})
-            if supp:
-                result.append({
-                    "name": supp["name"].split(' ')[0], # Just taking first word like mock data did
-                    "sales": sale["total_sold"]
-                })
-        except Exception:
-            pass
-            
-    return result
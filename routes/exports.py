@@ -0,0 +1,129 @@
+"""
+Full-history exports for accounting.
+
+``GET /exports/{dataset}`` streams every matching row of members, payments,
+attendance or orders as CSV or NDJSON. Rows go straight from the Motor
+cursor to the response in small blocks, so memory stays flat no matter how
+many rows an owner has; nothing is collected into a list or run through the
+response models.
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+
+from database import get_db
+from auth import require_owner
+from dates import day_range, sort_field
+from routes.dashboard import parse_day
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+# Documents fetched per cursor round trip, and rows encoded per response chunk
+EXPORT_BATCH_SIZE = 1000
+ROWS_PER_CHUNK = 500
+
+# dataset -> (date field filtered by from/to, columns); "id" is the document _id
+EXPORTS = {
+    "members": ("joining_date", [
+        "id", "name", "email", "phone", "address", "joining_date", "expiry_date", "plan_id", "status",
+        "due_amount", "paid_amount", "emergency_contact", "blood_group", "height", "weight", "goal",
+    ]),
+    "payments": ("date", [
+        "id", "member_id", "amount", "date", "status", "plan_id", "method", "invoice_id",
+        "razorpay_order_id", "razorpay_payment_id",
+    ]),
+    "attendance": ("date", ["id", "member_id", "date", "check_in", "check_out"]),
+    "orders": ("date", [
+        "id", "member_id", "date", "items", "total", "status", "payment_status",
+        "razorpay_order_id", "razorpay_payment_id",
+    ]),
+}
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_cursor(db, dataset: str, owner_id: str, first: Optional[date], last: Optional[date], status: Optional[str]):
+    field, columns = EXPORTS[dataset]
+    query = {"owner_id": owner_id}
+    if first or last:
+        query.update(day_range(field, first, last))
+    if status:
+        query["status"] = status
+    projection = {column: 1 for column in columns if column != "id"}
+    if dataset == "members":
+        # Member exports read in roster order along the (owner_id, name, _id) index
+        sort = [("name", 1), ("_id", 1)]
+    elif sort_field(field) == field:
+        sort = [(field, 1), ("_id", 1)]
+    else:
+        sort = [(sort_field(field), 1)]
+    return db[dataset].find(query, projection).sort(sort).batch_size(EXPORT_BATCH_SIZE)
+
+
+def _row(doc: dict, columns: list) -> dict:
+    row = {column: doc.get(column) for column in columns}
+    row["id"] = str(doc["_id"])
+    return row
+
+
+async def stream_csv(cursor, columns: list):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+    async for doc in cursor:
+        row = _row(doc, columns)
+        writer.writerow([
+            json.dumps(value, separators=(",", ":")) if isinstance(value, (list, dict)) else value
+            for value in row.values()
+        ])
+        rows += 1
+        if rows % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def stream_ndjson(cursor, columns: list):
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(_row(doc, columns), separators=(",", ":"), default=str))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str = Path(..., pattern="^(members|payments|attendance|orders)$"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    status: Optional[str] = Query(None),
+    _owner=Depends(require_owner),
+):
+    """Stream ``dataset`` as CSV or NDJSON, optionally limited to a date range (inclusive)."""
+    first = parse_day(from_date, "from") if from_date else None
+    last = parse_day(to_date, "to") if to_date else None
+    if first and last and first > last:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if status and dataset == "attendance":
+        raise HTTPException(status_code=400, detail="Attendance exports have no status filter")
+
+    columns = EXPORTS[dataset][1]
+    cursor = export_cursor(get_db(), dataset, _owner["owner_id"], first, last, status)
+    stream = stream_csv(cursor, columns) if fmt == "csv" else stream_ndjson(cursor, columns)
+    filename = f"{dataset}-{date.today().isoformat()}.{fmt}"
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from database import get_db
+from auth import get_current_user
+from media import MEDIA_MAX_MB, is_media_id, media_url, public_url, save_image, store
+
+router = APIRouter(prefix="/media", tags=["Media"])
+
+# Blob URLs are content hashes, so a response can never go stale
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def media_doc_to_out(doc: dict) -> dict:
+    return {
+        "id": doc["_id"],
+        "url": public_url(media_url(doc["_id"])),
+        "thumb_url": public_url(f"{media_url(doc['_id'])}/thumb"),
+        "content_type": doc["content_type"],
+        "size": doc["size"],
+        "width": doc.get("width"),
+        "height": doc.get("height"),
+    }
+
+
+@router.post("", status_code=201)
+async def upload_media(file: UploadFile = File(...), _user=Depends(get_current_user)):
+    """Upload an image; store the returned ``url`` in ``avatar`` / ``image``."""
+    data = await file.read(MEDIA_MAX_MB * 1024 * 1024 + 1)
+    doc = await save_image(data)
+    return media_doc_to_out(doc)
+
+
+async def serve(media_id: str, if_none_match: Optional[str], thumb: bool):
+    if not is_media_id(media_id):
+        raise HTTPException(status_code=404, detail="Media not found")
+    doc = await get_db().media.find_one({"_id": media_id})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if thumb and doc.get("thumb"):
+        doc = await get_db().media.find_one({"_id": doc["thumb"]}) or doc
+
+    etag = f'"{doc["_id"]}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    headers["Content-Length"] = str(doc["size"])
+    return StreamingResponse(store.stream(doc["_id"]), media_type=doc["content_type"], headers=headers)
+
+
+# Served without auth so <img> tags can load them; ids are unguessable content hashes
+@router.get("/{media_id}")
+async def get_media(media_id: str, if_none_match: Optional[str] = Header(None)):
+    return await serve(media_id, if_none_match, thumb=False)
+
+
+@router.get("/{media_id}/thumb")
+async def get_media_thumb(media_id: str, if_none_match: Optional[str] = Header(None)):
+    return await serve(media_id, if_none_match, thumb=True)
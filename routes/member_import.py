@@ -0,0 +1,391 @@
+"""
+Bulk member import.
+
+``POST /members/import`` accepts a CSV (header row) or JSONL file with one
+member per row, spools it to disk and returns 202 with an import id straight
+away. The rows are then streamed from disk in the background: each one is
+validated as it is read, plans are resolved from a single lookup, passwords
+are hashed in worker processes, and members/users are written in chunks with
+``insert_many(ordered=False)``. ``GET /members/import/{id}`` reports progress
+and the per-row errors.
+
+Running imports heartbeat ``updated_at`` after every chunk. An import whose
+worker died (a restart or crash) stops heartbeating and is marked failed
+after IMPORT_STALE_MINUTES, at the next startup or the next status read; the
+spooled file is gone with the worker, so the file has to be uploaded again.
+
+Columns match ``POST /members`` (name, email, password, phone, address,
+plan_id, emergency_contact, blood_group, height, weight, goal, avatar) plus:
+
+    plan          plan name, instead of plan_id
+    joining_date  YYYY-MM-DD, defaults to today; expiry follows the plan
+
+Rows without a password get an account with no usable password (skipping
+the bcrypt cost); those members set one through "forgot password".
+"""
+
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from database import get_db
+from auth import require_owner
+from hashing import hash_passwords
+from models.member import MemberCreate
+from rollups import record_new_member
+from counters import same_second
+from report_cache import invalidate_owner
+from routes.members import build_member_doc
+from media import externalize
+
+load_dotenv()
+
+router = APIRouter(prefix="/members/import", tags=["Members"])
+
+IMPORT_MAX_MB = int(os.getenv("IMPORT_MAX_MB", "20"))
+IMPORT_CHUNK_SIZE = 500
+# Stored for rows without a password; bcrypt never accepts it, so login fails until a reset
+UNUSABLE_PASSWORD = "!"
+# The status document keeps this many row errors; `failed` has the full count
+MAX_REPORTED_ERRORS = 1000
+UPLOAD_READ_BYTES = 1024 * 1024
+# A queued/running import without a heartbeat for this long has lost its worker
+IMPORT_STALE_MINUTES = int(os.getenv("IMPORT_STALE_MINUTES", "10"))
+
+_running: set = set()
+
+
+def import_doc_to_out(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "filename": doc.get("filename"),
+        "format": doc["format"],
+        "status": doc["status"],
+        "rows": doc.get("rows", 0),
+        "imported": doc.get("imported", 0),
+        "failed": doc.get("failed", 0),
+        "errors": doc.get("errors", []),
+        "error": doc.get("error"),
+        "created_at": doc["created_at"].isoformat(),
+        "finished_at": doc["finished_at"].isoformat() if doc.get("finished_at") else None,
+    }
+
+
+# ─── Parsing & validation ─────────────────────────────────────────────────────
+
+def _clean(raw: dict) -> dict:
+    row = {}
+    for key, value in raw.items():
+        if key is None:
+            continue
+        key = str(key).strip().lower().replace(" ", "_")
+        if isinstance(value, str):
+            value = value.strip()
+        row[key] = None if value == "" else value
+    return row
+
+
+def iter_rows(path: str, fmt: str):
+    """Yield ``(row_number, row_or_None, error_or_None)`` straight from the spooled file."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            for number, raw in enumerate(csv.DictReader(f), start=1):
+                yield number, _clean(raw), None
+            return
+        number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                yield number, None, "Invalid JSON"
+                continue
+            if not isinstance(raw, dict):
+                yield number, None, "Each line must be a JSON object"
+                continue
+            yield number, _clean(raw), None
+
+
+def _text_fields() -> set:
+    return {name for name, field in MemberCreate.model_fields.items() if field.annotation in (str, Optional[str])}
+
+
+def validate_row(row: dict, plans_by_id: dict, plans_by_name: dict):
+    """Return ``(MemberCreate, plan, joining_date)`` or raise ValueError with a readable message."""
+    plan = None
+    if row.get("plan_id"):
+        plan = plans_by_id.get(str(row["plan_id"]))
+    elif row.get("plan"):
+        plan = plans_by_name.get(str(row["plan"]).lower())
+    if not plan:
+        raise ValueError("Membership plan not found")
+
+    joining = date.today()
+    if row.get("joining_date"):
+        try:
+            joining = date.fromisoformat(str(row["joining_date"]))
+        except ValueError:
+            raise ValueError("joining_date must be YYYY-MM-DD")
+
+    fields = {k: v for k, v in row.items() if k in MemberCreate.model_fields and v is not None}
+    # JSONL writers often emit phone numbers and the like as numbers
+    for key in fields.keys() & _text_fields():
+        if isinstance(fields[key], (int, float)) and not isinstance(fields[key], bool):
+            fields[key] = str(fields[key])
+    fields["plan_id"] = str(plan["_id"])
+    fields.setdefault("password", "")
+    try:
+        body = MemberCreate(**fields)
+    except ValidationError as e:
+        err = e.errors()[0]
+        field = ".".join(str(part) for part in err["loc"])
+        raise ValueError(f"{field}: {err['msg']}" if field else err["msg"])
+    return body, plan, joining
+
+
+def read_batch(rows, size: int, plans_by_id: dict, plans_by_name: dict) -> list:
+    """Parse and validate up to ``size`` rows; runs in a worker thread.
+
+    Returns ``(row_number, row, validated_or_None, error_or_None)`` tuples,
+    where ``validated`` is what ``validate_row`` returns.
+    """
+    batch = []
+    for number, row, error in rows:
+        validated = None
+        if row is not None:
+            try:
+                validated = validate_row(row, plans_by_id, plans_by_name)
+            except ValueError as e:
+                error = str(e)
+        batch.append((number, row, validated, error))
+        if len(batch) >= size:
+            break
+    return batch
+
+
+# ─── Writing ──────────────────────────────────────────────────────────────────
+
+async def write_chunk(db, owner_id: str, chunk: list) -> list:
+    """Insert one chunk of ``(row_number, body, member_doc)``; returns the row errors."""
+    errors = []
+    emails = [body.email for _, body, _ in chunk]
+    taken = {doc["email"] async for doc in db.members.find({"email": {"$in": emails}}, {"email": 1})}
+    has_user = {doc["email"] async for doc in db.users.find({"email": {"$in": emails}}, {"email": 1})}
+
+    pending = []
+    for number, body, member_doc in chunk:
+        if body.email in taken:
+            errors.append({"row": number, "email": body.email, "error": "Member with this email already exists"})
+        else:
+            pending.append((number, body, member_doc))
+    if not pending:
+        return errors
+
+    # Hash before writing anything so a member is never stored without its login.
+    # Members whose email already has a login keep it, same as POST /members
+    needs_user = [(number, body) for number, body, _ in pending if body.email not in has_user]
+    hashes = {number: UNUSABLE_PASSWORD for number, _ in needs_user}
+    to_hash = [(number, body.password) for number, body in needs_user if body.password]
+    if to_hash:
+        hashes.update(zip((number for number, _ in to_hash), await hash_passwords([pw for _, pw in to_hash])))
+
+    # Ids are the rollup event ids (see counters.py), so generate them right before the insert
+    for _, _, member_doc in pending:
+        member_doc["_id"] = ObjectId()
+    failed = set()
+    try:
+        await db.members.insert_many([doc for _, _, doc in pending], ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            number, body, _ = pending[err["index"]]
+            failed.add(number)
+            message = "Member with this email already exists" if err.get("code") == 11000 else err.get("errmsg")
+            errors.append({"row": number, "email": body.email, "error": message})
+    inserted = [(number, body, doc) for number, body, doc in pending if number not in failed]
+
+    users = [
+        {
+            "_id": doc["_id"],  # same ID as member doc
+            "name": body.name,
+            "email": body.email,
+            "hashed_password": hashes[number],
+            "role": "member",
+            "phone": body.phone,
+            "owner_id": owner_id,
+        }
+        for number, body, doc in inserted
+        if number in hashes
+    ]
+    if users:
+        try:
+            await db.users.insert_many(users, ordered=False)
+        except BulkWriteError as e:
+            print(f"⚠️  Import skipped {len(e.details.get('writeErrors', []))} user account(s) that already exist")
+
+    joined: dict = {}
+    for _, _, doc in inserted:
+        joined.setdefault(doc["joining_date"], []).append(doc["_id"])
+    for day, ids in joined.items():
+        for group in same_second(ids):
+            await record_new_member(owner_id, day, group)
+    return errors
+
+
+async def _flush(db, import_id: ObjectId, owner_id: str, chunk: list, errors: list):
+    """Write a chunk of valid rows and record its progress alongside the invalid ones."""
+    write_errors = await write_chunk(db, owner_id, chunk) if chunk else []
+    imported = len(chunk) - len(write_errors)
+    await db.member_imports.update_one(
+        {"_id": import_id},
+        {
+            "$set": {"updated_at": datetime.utcnow()},
+            "$inc": {"rows": len(chunk) + len(errors), "imported": imported, "failed": len(errors) + len(write_errors)},
+            "$push": {"errors": {
+                "$each": sorted(errors + write_errors, key=lambda err: err["row"]),
+                "$slice": MAX_REPORTED_ERRORS,
+            }},
+        },
+    )
+    if imported:
+        await invalidate_owner(owner_id, "members")
+
+
+async def run_import(import_id: ObjectId, owner_id: str, path: str, fmt: str):
+    db = get_db()
+    try:
+        await db.member_imports.update_one(
+            {"_id": import_id}, {"$set": {"status": "running", "updated_at": datetime.utcnow()}}
+        )
+        plans = await db.plans.find({"owner_id": owner_id}).to_list(None)
+        plans_by_id = {str(p["_id"]): p for p in plans}
+        plans_by_name = {p["name"].lower(): p for p in plans}
+
+        seen = set()
+        chunk, errors = [], []
+        rows = iter_rows(path, fmt)
+        # File reads, parsing and validation happen off the event loop
+        while batch := await asyncio.to_thread(read_batch, rows, IMPORT_CHUNK_SIZE, plans_by_id, plans_by_name):
+            for number, row, validated, error in batch:
+                if validated:
+                    try:
+                        body, plan, joining = validated
+                        if body.email in seen:
+                            raise ValueError("Duplicate email in file")
+                        if body.avatar:
+                            try:
+                                body.avatar = await externalize(body.avatar)
+                            except HTTPException as e:
+                                raise ValueError(f"avatar: {e.detail}")
+                        seen.add(body.email)
+                        chunk.append((number, body, build_member_doc(owner_id, body, plan, joining)))
+                    except ValueError as e:
+                        error = str(e)
+                if error:
+                    errors.append({"row": number, "email": (row or {}).get("email"), "error": error})
+                if len(chunk) >= IMPORT_CHUNK_SIZE or len(errors) >= IMPORT_CHUNK_SIZE:
+                    await _flush(db, import_id, owner_id, chunk, errors)
+                    chunk, errors = [], []
+        await _flush(db, import_id, owner_id, chunk, errors)
+        await db.member_imports.update_one(
+            {"_id": import_id}, {"$set": {"status": "completed", "finished_at": datetime.utcnow()}}
+        )
+    except Exception as e:
+        print(f"❌ Member import {import_id} failed: {e}")
+        await db.member_imports.update_one(
+            {"_id": import_id},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}},
+        )
+    finally:
+        os.unlink(path)
+
+
+async def fail_stale_imports(db, query: dict = None) -> int:
+    """Mark queued/running imports that stopped heartbeating as failed."""
+    cutoff = datetime.utcnow() - timedelta(minutes=IMPORT_STALE_MINUTES)
+    result = await db.member_imports.update_many(
+        {
+            **(query or {}),
+            "status": {"$in": ["queued", "running"]},
+            "$or": [
+                {"updated_at": {"$lt": cutoff}},
+                {"updated_at": {"$exists": False}, "created_at": {"$lt": cutoff}},
+            ],
+        },
+        {"$set": {
+            "status": "failed",
+            "error": "Import was interrupted (server restart); please upload the file again",
+            "finished_at": datetime.utcnow(),
+        }},
+    )
+    if result.modified_count:
+        print(f"⚠️  Marked {result.modified_count} interrupted member import(s) as failed")
+    return result.modified_count
+
+
+# ─── Endpoints ────────────────────────────────────────────────────────────────
+
+@router.post("", status_code=202)
+async def import_members(
+    file: UploadFile = File(...),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(csv|jsonl)$"),
+    _owner=Depends(require_owner),
+):
+    if not fmt:
+        name = (file.filename or "").lower()
+        fmt = "jsonl" if name.endswith((".jsonl", ".ndjson")) else "csv"
+
+    # Spool to disk in blocks so large files never sit in memory
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{fmt}") as spool:
+        path = spool.name
+        while block := await file.read(UPLOAD_READ_BYTES):
+            size += len(block)
+            if size > IMPORT_MAX_MB * 1024 * 1024:
+                spool.close()
+                os.unlink(path)
+                raise HTTPException(status_code=413, detail=f"Import files are limited to {IMPORT_MAX_MB} MB")
+            spool.write(block)
+
+    doc = {
+        "owner_id": _owner["owner_id"],
+        "filename": file.filename,
+        "format": fmt,
+        "status": "queued",
+        "rows": 0,
+        "imported": 0,
+        "failed": 0,
+        "errors": [],
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+    result = await get_db().member_imports.insert_one(doc)
+    doc["_id"] = result.inserted_id
+
+    task = asyncio.create_task(run_import(doc["_id"], _owner["owner_id"], path, fmt))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return import_doc_to_out(doc)
+
+
+@router.get("/{import_id}")
+async def import_status(import_id: str, _owner=Depends(require_owner)):
+    try:
+        oid = ObjectId(import_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid import ID")
+    await fail_stale_imports(get_db(), {"_id": oid})
+    doc = await get_db().member_imports.find_one({"_id": oid, "owner_id": _owner["owner_id"]})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return import_doc_to_out(doc)
@@ -1,7 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from database import get_db
-from models.member import MemberCreate, MemberUpdate, MemberSelfUpdate, MemberOut
-from auth import get_current_user, require_owner, get_password_hash
+from models.member import (
+    MemberCreate, MemberUpdate, MemberSelfUpdate, MemberOut, MemberListOut, MemberMonthAttendance, MemberOverview,
+    MemberStatsOut,
+)
+from auth import get_current_member, require_owner, forget_member
+from hashing import hash_password
+from rollups import record_new_member
+from member_stats import delete_member_stats, read_member_stats, stats_to_out
+from counters import COUNTER_PROJECTION
+from report_cache import invalidate_owner
+from pagination import PageParams, paginate
+from fieldsets import FieldSet, pick, projection
+from media import externalize, public_url
+from dates import date_fields, day_range, sort_field
+from search import SEARCH_FIELD, search, search_fields
+from routes.plans import plan_doc_to_out
+from routes.payments import payment_doc_to_out
+from routes.attendance import attendance_doc_to_out
+from routes.orders import order_doc_to_out
 from bson import ObjectId
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
@@ -9,6 +26,13 @@ from typing import Optional, List
 
 router = APIRouter(prefix="/members", tags=["Members"])
 
+# What the member list returns without ?fields=: every MemberOut field except
+# the avatar (often an inline data URL), the one heavy field
+ROSTER_FIELDS = [name for name in MemberOut.model_fields if name != "avatar"]
+MEMBER_LIST_DEFAULTS = {"due_amount": 0, "paid_amount": 0}
+
+member_fields = FieldSet(list(MemberOut.model_fields), default=ROSTER_FIELDS)
+
 
 def member_doc_to_out(doc: dict) -> MemberOut:
     return MemberOut(
@@ -21,7 +45,7 @@ def member_doc_to_out(doc: dict) -> MemberOut:
         expiry_date=doc["expiry_date"],
         plan_id=doc["plan_id"],
         status=doc["status"],
-        avatar=doc.get("avatar"),
+        avatar=public_url(doc.get("avatar")),
         due_amount=doc.get("due_amount", 0),
         paid_amount=doc.get("paid_amount", 0),
         emergency_contact=doc.get("emergency_contact"),
@@ -32,31 +56,66 @@ def member_doc_to_out(doc: dict) -> MemberOut:
     )
 
 
-@router.get("", response_model=List[MemberOut])
+def _list_row(doc: dict, fields: list) -> dict:
+    row = pick(doc, fields, MEMBER_LIST_DEFAULTS)
+    if "avatar" in row:
+        row["avatar"] = public_url(row["avatar"])
+    return row
+
+
+def build_member_doc(owner_id: str, body: MemberCreate, plan: dict, joining: date) -> dict:
+    """A new member document on ``plan`` starting ``joining`` (also used by bulk import)."""
+    try:
+        expiry = joining + relativedelta(months=plan["duration"])
+    except Exception:
+        expiry = joining
+
+    member_doc = {
+        "owner_id": owner_id,
+        "name": body.name,
+        "email": body.email,
+        "phone": body.phone,
+        "address": body.address,
+        "plan_id": body.plan_id,
+        "joining_date": joining.isoformat(),
+        "expiry_date": expiry.isoformat(),
+        "status": "active" if expiry >= date.today() else "expired",
+        "due_amount": plan["price"],
+        "paid_amount": 0,
+        "emergency_contact": body.emergency_contact,
+        "blood_group": body.blood_group,
+        "height": body.height,
+        "weight": body.weight,
+        "goal": body.goal,
+        "avatar": body.avatar,
+        "created_at": datetime.utcnow(),
+    }
+    member_doc.update(date_fields(member_doc))
+    member_doc.update(search_fields("members", member_doc))
+    return member_doc
+
+
+@router.get("", response_model=List[MemberListOut], response_model_exclude_unset=True)
 async def list_members(
-    search: Optional[str] = Query(None),
+    response: Response,
+    search_text: Optional[str] = Query(None, alias="search"),
     status_filter: Optional[str] = Query(None, alias="status"),
+    page: PageParams = Depends(),
+    fields: list = Depends(member_fields),
     _owner=Depends(require_owner)
 ):
     db = get_db()
     query = {"owner_id": _owner["owner_id"]}
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}},
-        ]
     if status_filter and status_filter != "all":
         query["status"] = status_filter
+    if search_text:
+        # Searches return the best `limit` matches by relevance rather than paging by name
+        members = await search(db.members, "members", query, search_text, page.limit, projection(fields))
+        return [_list_row(m, fields) for m in members]
 
-    # Auto-update expired statuses
-    today = date.today().isoformat()
-    await db.members.update_many(
-        {"expiry_date": {"$lt": today}, "status": "active", "owner_id": _owner["owner_id"]},
-        {"$set": {"status": "expired"}}
-    )
-
-    members = await db.members.find(query).sort("name", 1).to_list(1000)
-    return [member_doc_to_out(m) for m in members]
+    # Expired statuses are kept up to date by the background sweeper (scheduler.py)
+    members = await paginate(db.members, query, "name", 1, page, response, projection(fields, "name"))
+    return [_list_row(m, fields) for m in members]
 
 
 @router.post("", response_model=MemberOut, status_code=201)
@@ -73,75 +132,65 @@ async def create_member(body: MemberCreate, _owner=Depends(require_owner)):
     if not plan:
         raise HTTPException(status_code=404, detail="Membership plan not found")
 
-    today = date.today()
-    try:
-        from dateutil.relativedelta import relativedelta
-        expiry = today + relativedelta(months=plan["duration"])
-    except Exception:
-        expiry = today
+    # Hash before writing anything: a full hash queue (503) must not leave a member without a login
+    existing_user = await db.users.find_one({"email": body.email})
+    hashed_password = None if existing_user else await hash_password(body.password)
 
-    member_doc = {
-        "owner_id": _owner["owner_id"],
-        "name": body.name,
-        "email": body.email,
-        "phone": body.phone,
-        "address": body.address,
-        "plan_id": body.plan_id,
-        "joining_date": today.isoformat(),
-        "expiry_date": expiry.isoformat(),
-        "status": "active",
-        "due_amount": plan["price"],
-        "paid_amount": 0,
-        "emergency_contact": body.emergency_contact,
-        "blood_group": body.blood_group,
-        "height": body.height,
-        "weight": body.weight,
-        "goal": body.goal,
-        "avatar": body.avatar,
-        "created_at": datetime.utcnow(),
-    }
+    body.avatar = await externalize(body.avatar)
+    member_doc = build_member_doc(_owner["owner_id"], body, plan, date.today())
     result = await db.members.insert_one(member_doc)
+    await record_new_member(_owner["owner_id"], member_doc["joining_date"], [result.inserted_id])
 
     # Create a user account for the member so they can log in
-    existing_user = await db.users.find_one({"email": body.email})
     if not existing_user:
         await db.users.insert_one({
             "_id": result.inserted_id,  # same ID as member doc
             "name": body.name,
             "email": body.email,
-            "hashed_password": get_password_hash(body.password),
+            "hashed_password": hashed_password,
             "role": "member",
             "phone": body.phone,
             "owner_id": _owner["owner_id"]
         })
 
+    await invalidate_owner(_owner["owner_id"], "members")
     member_doc["_id"] = result.inserted_id
     return member_doc_to_out(member_doc)
 
 
 @router.get("/me", response_model=MemberOut)
-async def get_my_profile(current_user: dict = Depends(get_current_user)):
+async def get_my_profile(member: dict = Depends(get_current_member)):
     db = get_db()
-    member = await db.members.find_one({"email": current_user["email"]})
+    member = await db.members.find_one({"_id": ObjectId(member["member_id"])})
     if not member:
         raise HTTPException(status_code=404, detail="Member profile not found")
     return member_doc_to_out(member)
 
 
+@router.get("/me/stats", response_model=MemberStatsOut)
+async def get_my_stats(member: dict = Depends(get_current_member)):
+    """Visits, streaks and spend for the member app home screen."""
+    return await read_member_stats(member["member_id"])
+
+
 @router.put("/me", response_model=MemberOut)
-async def update_my_profile(body: MemberSelfUpdate, current_user: dict = Depends(get_current_user)):
+async def update_my_profile(body: MemberSelfUpdate, member: dict = Depends(get_current_member)):
     db = get_db()
     update_data = {k: v for k, v in body.model_dump().items() if v is not None}
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
+    if "name" in update_data:
+        update_data.update(search_fields("members", {"email": member["email"], **update_data}))
 
     result = await db.members.find_one_and_update(
-        {"email": current_user["email"]},
+        {"_id": ObjectId(member["member_id"])},
         {"$set": update_data},
         return_document=True
     )
     if not result:
         raise HTTPException(status_code=404, detail="Member not found")
+    forget_member(member["member_id"])
+    await invalidate_owner(member["owner_id"], "members")
     return member_doc_to_out(result)
 
 
@@ -158,6 +207,81 @@ async def get_member(member_id: str, _owner=Depends(require_owner)):
     return member_doc_to_out(member)
 
 
+def _member_lookup(collection: str, name: str, *stages: dict, match: dict = None) -> dict:
+    """``$lookup`` of ``collection`` rows belonging to the member, as ``name``."""
+    return {"$lookup": {
+        "from": collection,
+        "let": {"member_id": {"$toString": "$_id"}, "owner_id": "$owner_id"},
+        "pipeline": [
+            {"$match": {**(match or {}), "$expr": {"$and": [
+                {"$eq": ["$member_id", "$$member_id"]},
+                {"$eq": ["$owner_id", "$$owner_id"]},
+            ]}}},
+            *stages,
+        ],
+        "as": name,
+    }}
+
+
+@router.get("/{member_id}/overview", response_model=MemberOverview)
+async def member_overview(
+    member_id: str,
+    limit: int = Query(10, ge=1, le=100, description="Payments and orders to include"),
+    _owner=Depends(require_owner),
+):
+    """Profile, plan, recent payments and orders and this month's attendance in one round trip."""
+    db = get_db()
+    try:
+        oid = ObjectId(member_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid member ID")
+    today = date.today()
+    month_start = today.replace(day=1)
+    month_end = month_start + relativedelta(months=1, days=-1)
+    newest_visit = {"$sort": {sort_field("date"): -1, "_id": -1}}
+
+    pipeline = [
+        {"$match": {"_id": oid, "owner_id": _owner["owner_id"]}},
+        {"$project": {SEARCH_FIELD: 0}},
+        {"$addFields": {"plan_oid": {
+            "$convert": {"input": "$plan_id", "to": "objectId", "onError": None, "onNull": None}
+        }}},
+        {"$lookup": {"from": "plans", "localField": "plan_oid", "foreignField": "_id", "as": "plan"}},
+        _member_lookup("payments", "payments", {"$sort": {"date": -1, "_id": -1}}, {"$limit": limit}),
+        _member_lookup("attendance", "month_visits", newest_visit, match=day_range("date", month_start, month_end)),
+        _member_lookup("attendance", "last_visit", newest_visit, {"$limit": 1}, {"$project": {"date": 1}}),
+        _member_lookup("orders", "orders", {"$sort": {"date": -1, "_id": -1}}, {"$limit": limit}),
+        {"$lookup": {
+            "from": "member_stats",
+            "let": {"member_key": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$member_key"]}}},
+                {"$project": {**COUNTER_PROJECTION, "_id": 0}},
+            ],
+            "as": "stats",
+        }},
+    ]
+    docs = await db.members.aggregate(pipeline).to_list(1)
+    if not docs:
+        raise HTTPException(status_code=404, detail="Member not found")
+    doc = docs[0]
+
+    plan = next((p for p in doc["plan"] if p.get("owner_id") == _owner["owner_id"]), None)
+    return MemberOverview(
+        member=member_doc_to_out(doc),
+        plan=plan_doc_to_out(plan) if plan else None,
+        payments=[payment_doc_to_out(p) for p in doc["payments"]],
+        attendance=MemberMonthAttendance(
+            month=month_start.strftime("%Y-%m"),
+            visits=len(doc["month_visits"]),
+            last_visit=doc["last_visit"][0]["date"] if doc["last_visit"] else None,
+            records=[attendance_doc_to_out(r) for r in doc["month_visits"]],
+        ),
+        orders=[order_doc_to_out(o) for o in doc["orders"]],
+        stats=stats_to_out(doc["stats"][0] if doc["stats"] else None),
+    )
+
+
 @router.put("/{member_id}", response_model=MemberOut)
 async def update_member(member_id: str, body: MemberUpdate, _owner=Depends(require_owner)):
     db = get_db()
@@ -167,12 +291,14 @@ async def update_member(member_id: str, body: MemberUpdate, _owner=Depends(requi
         raise HTTPException(status_code=400, detail="Invalid member ID")
 
     update_data = {k: v for k, v in body.model_dump().items() if v is not None}
+    if "avatar" in update_data:
+        update_data["avatar"] = await externalize(update_data["avatar"])
 
     # Handle password update if provided by admin
     if "password" in update_data:
         new_password = update_data.pop("password")
         if new_password:
-            new_hash = get_password_hash(new_password)
+            new_hash = await hash_password(new_password)
             await db.users.update_one(
                 {"_id": oid},
                 {"$set": {"hashed_password": new_hash}}
@@ -194,6 +320,12 @@ async def update_member(member_id: str, body: MemberUpdate, _owner=Depends(requi
             except Exception:
                 pass
 
+    if "name" in update_data or "email" in update_data:
+        current = await db.members.find_one({"_id": oid, "owner_id": _owner["owner_id"]}, {"name": 1, "email": 1})
+        if current:
+            update_data.update(search_fields("members", {**current, **update_data}))
+
+    update_data.update(date_fields(update_data))
     result = await db.members.find_one_and_update(
         {"_id": oid, "owner_id": _owner["owner_id"]},
         {"$set": update_data},
@@ -201,6 +333,8 @@ async def update_member(member_id: str, body: MemberUpdate, _owner=Depends(requi
     )
     if not result:
         raise HTTPException(status_code=404, detail="Member not found")
+    forget_member(member_id)
+    await invalidate_owner(_owner["owner_id"], "members")
     return member_doc_to_out(result)
 
 
@@ -216,4 +350,7 @@ async def delete_member(member_id: str, _owner=Depends(require_owner)):
         raise HTTPException(status_code=404, detail="Member not found")
     # Also remove user account
     await db.users.delete_one({"_id": oid})
+    await delete_member_stats(member_id)
+    forget_member(member_id)
+    await invalidate_owner(_owner["owner_id"], "members")
     return {"message": "Member deleted successfully"}
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Response
 from database import get_db
-from models.order import OrderCreate, OrderOut, OrderItem
-from auth import require_owner, get_current_user
+from models.order import OrderCreate, OrderOut, OrderItem, OrderListOut
+from auth import require_owner, get_current_member
+from pagination import PageParams, paginate
+from fieldsets import FieldSet, pick, projection
+from rollups import record_order
+from member_stats import record_member_order
+from report_cache import invalidate_owner
+from dates import date_fields
 from bson import ObjectId
+from pymongo import UpdateOne
 from datetime import date
 from typing import List
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+ORDER_LIST_DEFAULTS = {"items": [], "payment_status": "pending"}
+
+order_fields = FieldSet(list(OrderOut.model_fields))
+
 
 def order_doc_to_out(doc: dict) -> OrderOut:
     items = [OrderItem(**item) for item in doc.get("items", [])]
@@ -24,66 +36,127 @@ def order_doc_to_out(doc: dict) -> OrderOut:
     )
 
 
-@router.get("", response_model=List[OrderOut])
-async def list_orders(_owner=Depends(require_owner)):
+async def reserve_stock(db, owner_id: str, quantities: dict) -> list:
+    """Decrement stock for every supplement in ``quantities`` or for none of them.
+
+    Each item gets its own conditional ``$inc`` that only matches while enough
+    stock is left; they run concurrently, and an update that modified nothing
+    marks its item as failed (out of stock, or deleted since validation). If
+    any item failed, the ones that succeeded are put back. Returns the ids
+    that could not be reserved (empty on success).
+    """
+    sids = list(quantities)
+    results = await asyncio.gather(*(
+        db.supplements.update_one(
+            {"_id": sid, "owner_id": owner_id, "stock": {"$gte": quantities[sid]}},
+            {"$inc": {"stock": -quantities[sid]}},
+        )
+        for sid in sids
+    ))
+    failed = [sid for sid, result in zip(sids, results) if result.modified_count != 1]
+    if failed:
+        await release_stock(db, {sid: qty for sid, qty in quantities.items() if sid not in failed})
+    return failed
+
+
+async def release_stock(db, quantities: dict):
+    """Undo a reservation made by ``reserve_stock``."""
+    if quantities:
+        await db.supplements.bulk_write(
+            [UpdateOne({"_id": sid}, {"$inc": {"stock": qty}}) for sid, qty in quantities.items()],
+            ordered=False,
+        )
+
+
+@router.get("", response_model=List[OrderListOut], response_model_exclude_unset=True)
+async def list_orders(
+    response: Response,
+    page: PageParams = Depends(),
+    fields: list = Depends(order_fields),
+    _owner=Depends(require_owner),
+):
     db = get_db()
-    orders = await db.orders.find({"owner_id": _owner["owner_id"]}).sort("date", -1).to_list(1000)
-    return [order_doc_to_out(o) for o in orders]
+    orders = await paginate(
+        db.orders, {"owner_id": _owner["owner_id"]}, "date", -1, page, response, projection(fields, "date")
+    )
+    return [pick(o, fields, ORDER_LIST_DEFAULTS) for o in orders]
 
 
 @router.get("/me", response_model=List[OrderOut])
-async def my_orders(current_user: dict = Depends(get_current_user)):
+async def my_orders(member: dict = Depends(get_current_member)):
     db = get_db()
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member profile not found")
-    orders = await db.orders.find({"member_id": str(member["_id"])}).sort("date", -1).to_list(100)
+    orders = await db.orders.find({"member_id": member["member_id"]}).sort("date", -1).to_list(100)
     return [order_doc_to_out(o) for o in orders]
 
 
 @router.post("", response_model=OrderOut, status_code=201)
-async def place_order(body: OrderCreate, current_user: dict = Depends(get_current_user)):
+async def place_order(body: OrderCreate, member: dict = Depends(get_current_member)):
     db = get_db()
+    member_id = member["member_id"]
 
-    # Get member
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member profile not found")
-    member_id = str(member["_id"])
+    if not body.items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
 
-    # Validate items and compute total
-    validated_items = []
-    total = 0.0
+    # Validate the whole cart with a single lookup before touching stock
+    quantities = {}
     for item in body.items:
         try:
             sid = ObjectId(item.supplement_id)
         except Exception:
             raise HTTPException(status_code=400, detail=f"Invalid supplement ID: {item.supplement_id}")
-        supplement = await db.supplements.find_one({"_id": sid, "owner_id": current_user["owner_id"]})
+        if item.quantity < 1:
+            raise HTTPException(status_code=400, detail=f"Invalid quantity for supplement {item.supplement_id}")
+        quantities[sid] = quantities.get(sid, 0) + item.quantity
+
+    supplements = await db.supplements.find(
+        {"_id": {"$in": list(quantities)}, "owner_id": member["owner_id"]}
+    ).to_list(None)
+    by_id = {s["_id"]: s for s in supplements}
+    for sid, qty in quantities.items():
+        supplement = by_id.get(sid)
         if not supplement:
-            raise HTTPException(status_code=404, detail=f"Supplement {item.supplement_id} not found")
-        if supplement["stock"] < item.quantity:
+            raise HTTPException(status_code=404, detail=f"Supplement {sid} not found")
+        if supplement["stock"] < qty:
             raise HTTPException(
                 status_code=400,
                 detail=f"Insufficient stock for {supplement['name']}. Available: {supplement['stock']}"
             )
+
+    failed = await reserve_stock(db, member["owner_id"], quantities)
+    if failed:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Insufficient stock for {by_id[failed[0]]['name']}. Please refresh your cart and try again."
+        )
+
+    validated_items = []
+    total = 0.0
+    for item in body.items:
+        supplement = by_id[ObjectId(item.supplement_id)]
         validated_items.append({
             "supplement_id": item.supplement_id,
             "quantity": item.quantity,
             "price": supplement["price"],
         })
         total += supplement["price"] * item.quantity
-        # Reduce stock
-        await db.supplements.update_one({"_id": sid}, {"$inc": {"stock": -item.quantity}})
 
     order_doc = {
-        "owner_id": current_user["owner_id"],
+        "owner_id": member["owner_id"],
         "member_id": member_id,
         "items": validated_items,
         "total": round(total, 2),
         "date": date.today().isoformat(),
         "status": "pending",
     }
-    result = await db.orders.insert_one(order_doc)
+    order_doc.update(date_fields(order_doc))
+    try:
+        result = await db.orders.insert_one(order_doc)
+    except Exception:
+        # Give the reserved stock back if the order itself could not be recorded
+        await release_stock(db, quantities)
+        raise
     order_doc["_id"] = result.inserted_id
+    await record_order(member["owner_id"], order_doc["date"], validated_items, order_doc["total"], result.inserted_id)
+    await record_member_order(member["owner_id"], member_id, order_doc["date"], order_doc["total"], result.inserted_id)
+    await invalidate_owner(member["owner_id"], "supplements")
     return order_doc_to_out(order_doc)
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from database import get_db
 from models.payment import PaymentCreate, PaymentOut
-from auth import require_owner, get_current_user
+from auth import require_owner, get_current_member
+from pagination import PageParams, paginate
+from rollups import record_payment
+from member_stats import record_member_payment
+from report_cache import invalidate_owner
+from dates import date_fields
 from bson import ObjectId
 from datetime import date
 from typing import Optional, List
@@ -34,8 +39,10 @@ def payment_doc_to_out(doc: dict) -> PaymentOut:
 
 @router.get("", response_model=List[PaymentOut])
 async def list_payments(
+    response: Response,
     status_filter: Optional[str] = Query(None, alias="status"),
     member_id: Optional[str] = Query(None),
+    page: PageParams = Depends(),
     _owner=Depends(require_owner),
 ):
     db = get_db()
@@ -44,17 +51,14 @@ async def list_payments(
         query["status"] = status_filter
     if member_id:
         query["member_id"] = member_id
-    payments = await db.payments.find(query).sort("date", -1).to_list(1000)
+    payments = await paginate(db.payments, query, "date", -1, page, response)
     return [payment_doc_to_out(p) for p in payments]
 
 
 @router.get("/me", response_model=List[PaymentOut])
-async def my_payments(current_user: dict = Depends(get_current_user)):
+async def my_payments(member: dict = Depends(get_current_member)):
     db = get_db()
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member profile not found")
-    payments = await db.payments.find({"member_id": str(member["_id"])}).sort("date", -1).to_list(100)
+    payments = await db.payments.find({"member_id": member["member_id"]}).sort("date", -1).to_list(100)
     return [payment_doc_to_out(p) for p in payments]
 
 
@@ -77,11 +81,15 @@ async def create_payment(body: PaymentCreate, _owner=Depends(require_owner)):
         "amount": body.amount,
         "date": date.today().isoformat(),
         "status": "paid",
+        "paid_id": ObjectId(),  # counters event id (see counters.py)
         "plan_id": body.plan_id,
         "method": body.method or "Cash",
         "invoice_id": invoice_id,
     }
+    payment_doc.update(date_fields(payment_doc))
     result = await db.payments.insert_one(payment_doc)
+    await record_payment(_owner["owner_id"], payment_doc["date"], body.amount, payment_doc["method"], payment_doc["paid_id"])
+    await record_member_payment(_owner["owner_id"], body.member_id, payment_doc["date"], body.amount, payment_doc["paid_id"])
 
     # Update member's paid/due amounts
     await db.members.update_one(
@@ -91,6 +99,7 @@ async def create_payment(body: PaymentCreate, _owner=Depends(require_owner)):
             "$set": {"due_amount": max(0, member.get("due_amount", 0) - body.amount)}
         }
     )
+    await invalidate_owner(_owner["owner_id"], "members")
     payment_doc["_id"] = result.inserted_id
     return payment_doc_to_out(payment_doc)
 
@@ -111,11 +120,17 @@ async def collect_payment(payment_id: str, _owner=Depends(require_owner)):
         raise HTTPException(status_code=400, detail="Payment already marked as paid")
 
     invoice_id = generate_invoice_id()
+    paid = {"status": "paid", "paid_id": ObjectId(), "invoice_id": invoice_id, "date": date.today().isoformat()}
+    # Only one of two concurrent collects may flip the status (and count the payment)
     result = await db.payments.find_one_and_update(
-        {"_id": oid, "owner_id": _owner["owner_id"]},
-        {"$set": {"status": "paid", "invoice_id": invoice_id, "date": date.today().isoformat()}},
+        {"_id": oid, "owner_id": _owner["owner_id"], "status": {"$ne": "paid"}},
+        {"$set": {**paid, **date_fields(paid)}},
         return_document=True,
     )
+    if result is None:
+        raise HTTPException(status_code=400, detail="Payment already marked as paid")
+    await record_payment(_owner["owner_id"], result["date"], result["amount"], result.get("method", "Cash"), result["paid_id"])
+    await record_member_payment(_owner["owner_id"], result["member_id"], result["date"], result["amount"], result["paid_id"])
     # Update member
     try:
         mid = ObjectId(payment["member_id"])
@@ -130,4 +145,5 @@ async def collect_payment(payment_id: str, _owner=Depends(require_owner)):
             )
     except Exception:
         pass
+    await invalidate_owner(_owner["owner_id"], "members")
     return payment_doc_to_out(result)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from database import get_db
 from models.plan import PlanCreate, PlanUpdate, PlanOut
 from auth import require_owner, get_current_user
+from report_cache import invalidate_owner
 from bson import ObjectId
 from typing import List
 
@@ -32,6 +33,7 @@ async def create_plan(body: PlanCreate, _owner=Depends(require_owner)):
     doc["owner_id"] = _owner["owner_id"]
     result = await db.plans.insert_one(doc)
     doc["_id"] = result.inserted_id
+    await invalidate_owner(_owner["owner_id"], "plans")
     return plan_doc_to_out(doc)
 
 
@@ -50,6 +52,7 @@ async def update_plan(plan_id: str, body: PlanUpdate, _owner=Depends(require_own
     )
     if not result:
         raise HTTPException(status_code=404, detail="Plan not found")
+    await invalidate_owner(_owner["owner_id"], "plans")
     return plan_doc_to_out(result)
 
 
@@ -63,4 +66,5 @@ async def delete_plan(plan_id: str, _owner=Depends(require_owner)):
     result = await db.plans.delete_one({"_id": oid, "owner_id": _owner["owner_id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Plan not found")
+    await invalidate_owner(_owner["owner_id"], "plans")
     return {"message": "Plan deleted successfully"}
@@ -14,9 +14,14 @@ from typing import List
 from bson import ObjectId
 from datetime import date
 from database import get_db
-from auth import get_current_user
+from auth import get_current_member
 from models.payment import PaymentOut
 from models.order import OrderItem, OrderOut
+from routes.orders import reserve_stock
+from rollups import record_payment, record_order
+from member_stats import record_member_payment, record_member_order
+from report_cache import invalidate_owner
+from dates import date_fields
 import random
 import string
 
@@ -127,24 +132,24 @@ async def get_razorpay_key():
 
 
 @router.post("/create-membership-order", response_model=MembershipOrderResponse)
-async def create_membership_order(current_user: dict = Depends(get_current_user)):
+async def create_membership_order(member: dict = Depends(get_current_member)):
     """Create a Razorpay order for the member's pending membership due."""
     db = get_db()
     key_id, _ = _get_credentials()
 
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
+    dues = await db.members.find_one({"_id": ObjectId(member["member_id"])}, {"due_amount": 1})
+    if not dues:
         raise HTTPException(status_code=404, detail="Member profile not found")
 
-    due_amount = member.get("due_amount", 0)
+    due_amount = dues.get("due_amount", 0)
     if due_amount <= 0:
         raise HTTPException(status_code=400, detail="No pending dues found")
 
     amount_paise = int(due_amount * 100)
     order_data = await _create_razorpay_order(
         amount_paise=amount_paise,
-        receipt=f"membership_{str(member['_id'])}_{date.today().isoformat()}",
-        notes={"member_id": str(member["_id"]), "purpose": "membership_fee"},
+        receipt=f"membership_{member['member_id']}_{date.today().isoformat()}",
+        notes={"member_id": member["member_id"], "purpose": "membership_fee"},
     )
 
     return MembershipOrderResponse(
@@ -152,15 +157,15 @@ async def create_membership_order(current_user: dict = Depends(get_current_user)
         amount=amount_paise,
         currency="INR",
         key_id=key_id,
-        member_name=member.get("name", ""),
-        member_email=member.get("email", ""),
+        member_name=member["name"],
+        member_email=member["email"],
     )
 
 
 @router.post("/verify-membership-payment", response_model=PaymentOut)
 async def verify_membership_payment(
     body: VerifyMembershipPaymentRequest,
-    current_user: dict = Depends(get_current_user)
+    member: dict = Depends(get_current_member)
 ):
     """Verify payment signature and record the membership payment in DB."""
     db = get_db()
@@ -168,34 +173,35 @@ async def verify_membership_payment(
     if not verify_signature(body.razorpay_order_id, body.razorpay_payment_id, body.razorpay_signature):
         raise HTTPException(status_code=400, detail="Invalid payment signature. Verification failed.")
 
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member profile not found")
-
     invoice_id = generate_invoice_id()
     payment_doc = {
-        "owner_id": current_user["owner_id"],
-        "member_id": str(member["_id"]),
+        "owner_id": member["owner_id"],
+        "member_id": member["member_id"],
         "amount": body.amount,
         "date": date.today().isoformat(),
         "status": "paid",
+        "paid_id": ObjectId(),  # counters event id (see counters.py)
         "plan_id": body.plan_id,
         "method": "Online (Razorpay)",
         "invoice_id": invoice_id,
         "razorpay_order_id": body.razorpay_order_id,
         "razorpay_payment_id": body.razorpay_payment_id,
     }
+    payment_doc.update(date_fields(payment_doc))
     result = await db.payments.insert_one(payment_doc)
+    await record_payment(member["owner_id"], payment_doc["date"], body.amount, payment_doc["method"], payment_doc["paid_id"])
+    await record_member_payment(member["owner_id"], member["member_id"], payment_doc["date"], body.amount, payment_doc["paid_id"])
 
     # Clear member's due amount
     await db.members.update_one(
-        {"_id": member["_id"]},
+        {"_id": ObjectId(member["member_id"])},
         {
             "$inc": {"paid_amount": body.amount},
             "$set": {"due_amount": 0},
         }
     )
 
+    await invalidate_owner(member["owner_id"], "members")
     payment_doc["_id"] = result.inserted_id
     return PaymentOut(
         id=str(payment_doc["_id"]),
@@ -214,16 +220,12 @@ async def verify_membership_payment(
 @router.post("/create-store-order", response_model=StoreOrderResponse)
 async def create_store_order(
     body: StoreOrderRequest,
-    current_user: dict = Depends(get_current_user)
+    member: dict = Depends(get_current_member)
 ):
     """Validate cart items & create a Razorpay order for a store purchase."""
     db = get_db()
     key_id, _ = _get_credentials()
 
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member profile not found")
-
     if not body.items:
         raise HTTPException(status_code=400, detail="Cart is empty")
 
@@ -235,7 +237,7 @@ async def create_store_order(
         except Exception:
             raise HTTPException(status_code=400, detail=f"Invalid supplement ID: {item.supplement_id}")
 
-        supplement = await db.supplements.find_one({"_id": sid, "owner_id": current_user["owner_id"]})
+        supplement = await db.supplements.find_one({"_id": sid, "owner_id": member["owner_id"]})
         if not supplement:
             raise HTTPException(status_code=404, detail=f"Supplement {item.supplement_id} not found")
         if supplement["stock"] < item.quantity:
@@ -255,8 +257,8 @@ async def create_store_order(
     amount_paise = int(total * 100)
     order_data = await _create_razorpay_order(
         amount_paise=amount_paise,
-        receipt=f"store_{str(member['_id'])}_{date.today().isoformat()}",
-        notes={"member_id": str(member["_id"]), "purpose": "store_purchase"},
+        receipt=f"store_{member['member_id']}_{date.today().isoformat()}",
+        notes={"member_id": member["member_id"], "purpose": "store_purchase"},
     )
 
     return StoreOrderResponse(
@@ -264,8 +266,8 @@ async def create_store_order(
         amount=amount_paise,
         currency="INR",
         key_id=key_id,
-        member_name=member.get("name", ""),
-        member_email=member.get("email", ""),
+        member_name=member["name"],
+        member_email=member["email"],
         validated_items=validated_items,
     )
 
@@ -273,7 +275,7 @@ async def create_store_order(
 @router.post("/verify-store-payment", response_model=OrderOut)
 async def verify_store_payment(
     body: VerifyStorePaymentRequest,
-    current_user: dict = Depends(get_current_user)
+    member: dict = Depends(get_current_member)
 ):
     """Verify signature, deduct stock, and record the store order as paid."""
     db = get_db()
@@ -281,33 +283,45 @@ async def verify_store_payment(
     if not verify_signature(body.razorpay_order_id, body.razorpay_payment_id, body.razorpay_signature):
         raise HTTPException(status_code=400, detail="Invalid payment signature. Order not fulfilled.")
 
-    member = await db.members.find_one({"email": current_user["email"]})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member profile not found")
-
-    final_items = []
+    quantities = {}
     for item in body.items:
         try:
             sid = ObjectId(item.supplement_id)
         except Exception:
             raise HTTPException(status_code=400, detail=f"Invalid supplement ID: {item.supplement_id}")
+        if item.quantity < 1:
+            raise HTTPException(status_code=400, detail=f"Invalid quantity for supplement {item.supplement_id}")
+        quantities[sid] = quantities.get(sid, 0) + item.quantity
+    if not quantities:
+        raise HTTPException(status_code=400, detail="Cart is empty")
 
-        supplement = await db.supplements.find_one({"_id": sid, "owner_id": current_user["owner_id"]})
+    supplements = await db.supplements.find(
+        {"_id": {"$in": list(quantities)}, "owner_id": member["owner_id"]}
+    ).to_list(None)
+    by_id = {s["_id"]: s for s in supplements}
+    for sid, qty in quantities.items():
+        supplement = by_id.get(sid)
         if not supplement:
-            raise HTTPException(status_code=404, detail=f"Supplement {item.supplement_id} not found")
-        if supplement["stock"] < item.quantity:
+            raise HTTPException(status_code=404, detail=f"Supplement {sid} not found")
+        if supplement["stock"] < qty:
             raise HTTPException(status_code=400, detail=f"Insufficient stock for {supplement['name']}.")
 
-        await db.supplements.update_one({"_id": sid}, {"$inc": {"stock": -item.quantity}})
-        final_items.append({
+    failed = await reserve_stock(db, member["owner_id"], quantities)
+    if failed:
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for {by_id[failed[0]]['name']}.")
+
+    final_items = [
+        {
             "supplement_id": item.supplement_id,
             "quantity": item.quantity,
-            "price": supplement["price"],
-        })
+            "price": by_id[ObjectId(item.supplement_id)]["price"],
+        }
+        for item in body.items
+    ]
 
     order_doc = {
-        "owner_id": current_user["owner_id"],
-        "member_id": str(member["_id"]),
+        "owner_id": member["owner_id"],
+        "member_id": member["member_id"],
         "items": final_items,
         "total": round(body.total, 2),
         "date": date.today().isoformat(),
@@ -316,8 +330,12 @@ async def verify_store_payment(
         "razorpay_order_id": body.razorpay_order_id,
         "razorpay_payment_id": body.razorpay_payment_id,
     }
+    order_doc.update(date_fields(order_doc))
     result = await db.orders.insert_one(order_doc)
     order_doc["_id"] = result.inserted_id
+    await record_order(member["owner_id"], order_doc["date"], final_items, order_doc["total"], result.inserted_id)
+    await record_member_order(member["owner_id"], member["member_id"], order_doc["date"], order_doc["total"], result.inserted_id)
+    await invalidate_owner(member["owner_id"], "supplements")
 
     from models.order import OrderItem as OI
     return OrderOut(
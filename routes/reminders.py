@@ -22,6 +22,11 @@ async def get_pending_reminders(_owner=Depends(require_owner)):
     ).isoformat()
 
     members = await db.members.find({"owner_id": _owner["owner_id"]}).to_list(1000)
+    # Last visits come from the per-member summaries instead of scanning attendance
+    stats = await db.member_stats.find(
+        {"_id": {"$in": [str(m["_id"]) for m in members]}}, {"last_visit": 1}
+    ).to_list(None)
+    last_visits = {s["_id"]: s.get("last_visit") for s in stats}
     pending = []
     for member in members:
         expiry = member.get("expiry_date", "")
@@ -48,6 +53,7 @@ async def get_pending_reminders(_owner=Depends(require_owner)):
                         plan = plan_doc.get("name")
                 except Exception:
                     pass
+            last_visit = last_visits.get(str(member["_id"]))
             pending.append({
                 "id": str(member["_id"]),
                 "name": member["name"],
@@ -58,6 +64,8 @@ async def get_pending_reminders(_owner=Depends(require_owner)):
                 "days_until_expiry": days_until_expiry,
                 "due_amount": due,
                 "payment_status": "pending" if due > 0 else "paid",
+                "last_visit": last_visit,
+                "days_since_visit": (today - date.fromisoformat(last_visit)).days if last_visit else None,
             })
     return pending
 
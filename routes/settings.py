@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from database import get_db
 from models.settings import GymSettingsUpdate, GymSettingsOut
 from auth import require_owner, get_current_user
+from report_cache import invalidate_owner
 
 router = APIRouter(prefix="/settings", tags=["Settings"])
 
@@ -42,6 +43,7 @@ async def update_settings(body: GymSettingsUpdate, _owner=Depends(require_owner)
             {"owner_id": _owner["owner_id"]},
             {"$set": update_data}
         )
+    await invalidate_owner(_owner["owner_id"], "settings")
 
     settings = await db.gym_settings.find_one({"owner_id": _owner["owner_id"]})
     settings.pop("_id", None)
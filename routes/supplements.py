@@ -2,6 +2,9 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from database import get_db
 from models.supplement import SupplementCreate, SupplementUpdate, SupplementOut
 from auth import require_owner, get_current_user
+from report_cache import invalidate_owner
+from search import search, search_fields
+from media import externalize, public_url
 from bson import ObjectId
 from typing import Optional, List
 
@@ -16,23 +19,24 @@ def supplement_doc_to_out(doc: dict) -> SupplementOut:
         price=doc["price"],
         stock=doc["stock"],
         category=doc["category"],
-        image=doc.get("image"),
+        image=public_url(doc.get("image")),
     )
 
 
 @router.get("", response_model=List[SupplementOut])
 async def list_supplements(
-    search: Optional[str] = Query(None),
+    search_text: Optional[str] = Query(None, alias="search"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Defaults to 50 search matches, or 500 supplements"),
     _user=Depends(get_current_user),
 ):
     db = get_db()
     query = {"owner_id": _user["owner_id"]}
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"category": {"$regex": search, "$options": "i"}},
-        ]
-    supplements = await db.supplements.find(query).sort("name", 1).to_list(500)
+    if search_text:
+        # Best `limit` matches by relevance
+        supplements = await search(db.supplements, "supplements", query, search_text, limit or 50)
+        return [supplement_doc_to_out(s) for s in supplements]
+    limit = limit or 500
+    supplements = await db.supplements.find(query).sort("name", 1).limit(limit).to_list(limit)
     return [supplement_doc_to_out(s) for s in supplements]
 
 
@@ -40,9 +44,12 @@ async def list_supplements(
 async def create_supplement(body: SupplementCreate, _owner=Depends(require_owner)):
     db = get_db()
     doc = body.model_dump()
+    doc["image"] = await externalize(doc.get("image"))
     doc["owner_id"] = _owner["owner_id"]
+    doc.update(search_fields("supplements", doc))
     result = await db.supplements.insert_one(doc)
     doc["_id"] = result.inserted_id
+    await invalidate_owner(_owner["owner_id"], "supplements")
     return supplement_doc_to_out(doc)
 
 
@@ -56,11 +63,18 @@ async def update_supplement(supplement_id: str, body: SupplementUpdate, _owner=D
     update_data = {k: v for k, v in body.model_dump().items() if v is not None}
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
+    if "image" in update_data:
+        update_data["image"] = await externalize(update_data["image"])
+    if "name" in update_data or "category" in update_data:
+        current = await db.supplements.find_one({"_id": oid, "owner_id": _owner["owner_id"]}, {"name": 1, "category": 1})
+        if current:
+            update_data.update(search_fields("supplements", {**current, **update_data}))
     result = await db.supplements.find_one_and_update(
         {"_id": oid, "owner_id": _owner["owner_id"]}, {"$set": update_data}, return_document=True
     )
     if not result:
         raise HTTPException(status_code=404, detail="Supplement not found")
+    await invalidate_owner(_owner["owner_id"], "supplements")
     return supplement_doc_to_out(result)
 
 
@@ -74,4 +88,5 @@ async def delete_supplement(supplement_id: str, _owner=Depends(require_owner)):
     result = await db.supplements.delete_one({"_id": oid, "owner_id": _owner["owner_id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Supplement not found")
+    await invalidate_owner(_owner["owner_id"], "supplements")
     return {"message": "Supplement deleted successfully"}
@@ -0,0 +1,95 @@
+"""
+Background jobs that run inside the API process.
+
+The member expiry sweep marks memberships whose expiry date has passed as
+"expired" for every owner. It runs once at startup, then every
+EXPIRY_SWEEP_INTERVAL_MINUTES and always right after local midnight (when
+expiry dates actually roll over). When several uvicorn workers share a
+database, a short lease in the ``scheduler_locks`` collection makes sure only
+one of them performs each sweep.
+"""
+
+import asyncio
+import os
+import socket
+from datetime import date, datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+from database import get_db
+from report_cache import invalidate_all
+from dates import before_day, refresh_date_mode
+from search import refresh_search_mode
+
+load_dotenv()
+
+EXPIRY_SWEEP_INTERVAL_MINUTES = int(os.getenv("EXPIRY_SWEEP_INTERVAL_MINUTES", "60"))
+# How long a worker holds the sweep lease; other workers skip sweeps inside this window
+SWEEP_LEASE_SECONDS = 300
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_tasks: list = []
+
+
+async def acquire_lease(name: str, seconds: int) -> bool:
+    """Try to take (or renew) the named lease for this worker."""
+    db = get_db()
+    now = datetime.utcnow()
+    try:
+        await db.scheduler_locks.find_one_and_update(
+            {"_id": name, "$or": [{"locked_until": {"$lt": now}}, {"holder": WORKER_ID}]},
+            {"$set": {"holder": WORKER_ID, "locked_until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # Another worker holds a live lease, so the upsert collided with its document
+        return False
+
+
+async def expire_memberships() -> int:
+    """Mark every active membership past its expiry date as expired."""
+    db = get_db()
+    result = await db.members.update_many(
+        {**before_day("expiry_date", date.today()), "status": "active"},
+        {"$set": {"status": "expired"}}
+    )
+    return result.modified_count
+
+
+def seconds_until_next_sweep(now: datetime) -> float:
+    next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    until_midnight = (next_midnight - now).total_seconds() + 1
+    if EXPIRY_SWEEP_INTERVAL_MINUTES <= 0:
+        return until_midnight
+    return min(EXPIRY_SWEEP_INTERVAL_MINUTES * 60, until_midnight)
+
+
+async def expiry_sweeper():
+    while True:
+        try:
+            # Pick up backfills that finished since the last pass
+            await refresh_date_mode(get_db())
+            await refresh_search_mode(get_db())
+            if await acquire_lease("member_expiry", SWEEP_LEASE_SECONDS):
+                expired = await expire_memberships()
+                if expired:
+                    print(f"⏰ Expired {expired} membership(s)")
+                    await invalidate_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  Membership expiry sweep failed: {e}")
+        await asyncio.sleep(seconds_until_next_sweep(datetime.now()))
+
+
+def start_scheduler():
+    _tasks.append(asyncio.create_task(expiry_sweeper()))
+
+
+async def stop_scheduler():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
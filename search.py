@@ -0,0 +1,154 @@
+"""
+Indexed name search for members and supplements.
+
+Searchable documents carry a ``search_tokens`` array, rebuilt whenever the
+searched fields change and indexed together with ``owner_id``:
+
+    - the first one and two characters of every word  ("ra", "r")
+    - every three-character n-gram of every word      ("~rah", "~ahu", ...)
+
+Words are lowercased, stripped of accents and split on anything that is not a
+letter or digit, so "Rahul Sharma" / "rahul.sharma@email.com" tokenize the
+same way. A query term of one or two characters must start a word; longer
+terms can appear anywhere in a word. The index narrows the candidates, then
+each candidate is checked and ranked in Python (exact word > word prefix >
+infix, name matches before other fields). Candidates are capped, so they are
+fetched best tier first: documents where every term also starts a word, then
+the rest, each in name order.
+"""
+
+import re
+import unicodedata
+
+SEARCH_FIELD = "search_tokens"
+SEARCH_TOKENS_MIGRATION = "0002_search_tokens"
+
+# Searched fields per collection; the first field is the "name" that ranks highest
+SEARCH_FIELDS = {
+    "members": ("name", "email"),
+    "supplements": ("name", "category"),
+}
+
+# Upper bound on index candidates ranked for one query
+SEARCH_CANDIDATES = 500
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+_search_ready = False
+
+
+def words(text) -> list:
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return _WORD.findall(text.lower())
+
+
+def _term_tokens(term: str) -> list:
+    if len(term) < 3:
+        return [term]
+    return [f"~{term[i:i + 3]}" for i in range(len(term) - 2)]
+
+
+def search_tokens(*values) -> list:
+    tokens = set()
+    for value in values:
+        for word in words(value):
+            tokens.update(word[:n] for n in (1, 2))
+            tokens.update(_term_tokens(word))
+    return sorted(tokens)
+
+
+def search_fields(collection: str, doc: dict) -> dict:
+    """``{search_tokens: [...]}`` for a document holding every searched field."""
+    return {SEARCH_FIELD: search_tokens(*(doc.get(field) for field in SEARCH_FIELDS[collection]))}
+
+
+def search_ready() -> bool:
+    return _search_ready
+
+
+async def refresh_search_mode(db):
+    """Re-read whether existing documents have been backfilled with search tokens."""
+    global _search_ready
+    if not _search_ready:
+        done = await db.schema_migrations.find_one({"_id": SEARCH_TOKENS_MIGRATION, "applied_at": {"$ne": None}})
+        _search_ready = bool(done)
+
+
+def search_filter(collection: str, query: str, prefixes: bool = False) -> dict:
+    """Index-backed candidate filter for ``query`` (empty dict when it has no words).
+
+    ``prefixes`` also requires a word starting with each term's first two
+    characters, which keeps the exact and prefix matches ``rank`` puts first.
+    """
+    terms = words(query)
+    if not terms:
+        return {}
+    if not search_ready():
+        # Tokens aren't backfilled yet; fall back to scanning the raw fields
+        pattern = ".*".join(re.escape(term) for term in terms)
+        return {"$or": [
+            {field: {"$regex": pattern, "$options": "i"}} for field in SEARCH_FIELDS[collection]
+        ]}
+    tokens = {token for term in terms for token in _term_tokens(term)}
+    if prefixes:
+        tokens.update(term[:2] for term in terms)
+    return {SEARCH_FIELD: {"$all": sorted(tokens)}}
+
+
+def _score(terms: list, fields: list) -> int:
+    score = 0
+    for term in terms:
+        best = 0
+        for rank, field_words in enumerate(fields):
+            weight = 2 if rank == 0 else 1
+            for word in field_words:
+                if word == term:
+                    best = max(best, 3 * weight)
+                elif word.startswith(term):
+                    best = max(best, 2 * weight)
+                elif len(term) >= 3 and term in word:
+                    best = max(best, 1 * weight)
+        if not best:
+            return 0
+        score += best
+    return score
+
+
+def rank(collection: str, query: str, docs: list, limit: int) -> list:
+    """Drop index false positives and order ``docs`` by relevance, then name."""
+    terms = words(query)
+    name_field = SEARCH_FIELDS[collection][0]
+    scored = []
+    for doc in docs:
+        score = _score(terms, [words(doc.get(field)) for field in SEARCH_FIELDS[collection]])
+        if score:
+            scored.append((-score, str(doc.get(name_field) or "").lower(), doc))
+    scored.sort(key=lambda row: row[:2])
+    return [doc for _, _, doc in scored[:limit]]
+
+
+async def search(collection, name: str, base_query: dict, query: str, limit: int, projection: dict = None) -> list:
+    """Relevance-ranked documents matching ``query`` within ``base_query``."""
+    match = search_filter(name, query)
+    if not match:
+        return []
+    if projection:
+        # Ranking needs the searched fields even when the caller didn't ask for them
+        projection = {**projection, **{field: 1 for field in SEARCH_FIELDS[name]}}
+    else:
+        projection = {SEARCH_FIELD: 0}
+    tiers = [match]
+    if search_ready() and any(len(term) >= 3 for term in words(query)):
+        tiers.insert(0, search_filter(name, query, prefixes=True))
+    candidates = []
+    for tier in tiers:
+        seen = {"_id": {"$nin": [doc["_id"] for doc in candidates]}} if candidates else {}
+        room = SEARCH_CANDIDATES - len(candidates)
+        candidates += await collection.find({**base_query, **tier, **seen}, projection).sort(
+            SEARCH_FIELDS[name][0], 1
+        ).limit(room).to_list(room)
+        if len(candidates) >= SEARCH_CANDIDATES:
+            break
+    return rank(name, query, candidates, limit)
@@ -21,6 +21,8 @@ from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
 import os
 
+from migrations import run_migrations
+
 load_dotenv()
 
 MONGODB_URL = os.getenv("MONGODB_URL")
@@ -52,6 +54,7 @@ async def seed():
     await db.attendance.delete_many({})
     await db.orders.delete_many({})
     await db.gym_settings.delete_many({})
+    await db.schema_migrations.delete_many({})
     print("   🗑️  Cleared existing collections")
 
     # ── Owner User ─────────────────────────────────────────────────────
@@ -283,6 +286,9 @@ async def seed():
     })
     print("   ✅ Default gym settings inserted")
 
+    # ── Migrations (adds datetime fields to the sample data) ────────────
+    await run_migrations(db)
+
     client.close()
     print("\n🎉 Database seeded successfully!")
     print("\n📋 Login Credentials:")
@@ -0,0 +1,44 @@
+"""
+Single-flight request coalescing.
+
+When identical expensive computations are requested concurrently (an owner
+with the dashboard open on several devices, or a frontend firing duplicate
+requests), only the first caller runs the coroutine; every other caller with
+the same key awaits that same in-flight result. Nothing is kept once the
+computation finishes, so coalescing never serves stale data. Coalescing is
+per process.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict = {}
+        self._stats = {"executed": 0, "shared": 0}
+
+    async def do(self, key, fn):
+        """Run ``fn()`` for ``key`` unless an identical call is already in flight."""
+        task = self._calls.get(key)
+        if task is not None:
+            self._stats["shared"] += 1
+        else:
+            self._stats["executed"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so one disconnected caller doesn't cancel the work for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def metrics(self) -> dict:
+        executed, shared = self._stats["executed"], self._stats["shared"]
+        return {
+            "in_flight": len(self._calls),
+            "executed": executed,
+            "shared": shared,
+            "coalesced_rate": round(shared / (executed + shared), 4) if executed + shared else 0.0,
+        }